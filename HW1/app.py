@@ -1,10 +1,17 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, session
 import mysql.connector
-from werkzeug.security import generate_password_hash, check_password_hash
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 倉庫根目錄的 common 套件
+from common.password_hashing import PasswordHasher
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # 用於閃存消息和 session
 
+# pbkdf2 在有上限的執行緒池中計算，迭代次數由 PBKDF2_ITERATIONS 設定
+password_hasher = PasswordHasher.from_env('pbkdf2')
+
 # 連接 MySQL 資料庫
 def connect_db():
     return mysql.connector.connect(
@@ -22,7 +29,7 @@ def register():
         email = request.form.get("email")
         password = request.form.get("password")
         
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        hashed_password = password_hasher.hash(password)
 
         db = connect_db()
         cursor = db.cursor()
@@ -61,10 +68,16 @@ def login():
             print(f"Stored password hash: {user['password']}")
             print(f"User input password: {password}")
 
+        ok, new_hash = password_hasher.verify(user["password"], password) if user else (False, None)
+        if ok and new_hash:
+            # 迭代次數設定已改變，以新設定重新雜湊後寫回
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s", (new_hash, user["id"]))
+            db.commit()
+
         cursor.close()
         db.close()
 
-        if user and check_password_hash(user["password"], password):
+        if ok:
             session["user_id"] = user["id"]
             session["user_name"] = user["name"]
             session["user_email"] = user["email"]
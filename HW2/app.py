@@ -1,16 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from db import connect_db  # Import connect_db from db.py
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context
+from db import db_connection, pool_stats, set_query_observer  # Pooled connections from db.py
+from catalog import catalog  # Cached product list
+from bulk_orders import import_orders, export_orders  # Streaming CSV import/export
+import order_stats  # Per-user order summary tables
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
 from join import join_bp  # Import Blueprint from join.py
 import mysql.connector
+import io
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # Repository root, for the shared common package
+from common.password_hashing import PasswordHasher
+from common import metrics
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Used for flash messages and session
 
+# Per-route latency and MySQL statement timings, served at /metrics
+metrics.init_app(app, 'hw2')
+set_query_observer(metrics.db_observer('mysql'))
+
 # Register Blueprint
 app.register_blueprint(join_bp)
 
+# pbkdf2 hashing runs on a bounded worker pool; cost is set by PBKDF2_ITERATIONS
+password_hasher = PasswordHasher.from_env('pbkdf2')
+
 # Registration page
 @app.route("/", methods=["GET", "POST"])
 def register():
@@ -19,32 +36,30 @@ def register():
         email = request.form.get("email")
         password = request.form.get("password")
         
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
-
-        db = connect_db()
-        cursor = db.cursor()
-
-        # Check if username or email already exists
-        cursor.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
-        existing_user = cursor.fetchone()
+        hashed_password = password_hasher.hash(password)
 
-        if existing_user:
-            if existing_user[1] == username:
-                flash("Username already exists. Please choose another username.", "danger")
-            elif existing_user[2] == email:
-                flash("Email already exists. Please try another one.", "danger")
-        else:
+        with db_connection() as db:
+            cursor = db.cursor()
             try:
-                # Insert new user if no duplicates
-                cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)", (username, email, hashed_password))
-                db.commit()
-                flash("Registration successful! Please log in.", "success")
-                return redirect(url_for('login'))
+                # Check if username or email already exists
+                cursor.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
+                existing_user = cursor.fetchone()
+
+                if existing_user:
+                    if existing_user[1] == username:
+                        flash("Username already exists. Please choose another username.", "danger")
+                    elif existing_user[2] == email:
+                        flash("Email already exists. Please try another one.", "danger")
+                else:
+                    # Insert new user if no duplicates
+                    cursor.execute("INSERT INTO users (username, email, password_hash) VALUES (%s, %s, %s)", (username, email, hashed_password))
+                    db.commit()
+                    flash("Registration successful! Please log in.", "success")
+                    return redirect(url_for('login'))
             except mysql.connector.Error as e:
                 flash(f"An error occurred: {str(e)}", "danger")
             finally:
                 cursor.close()
-                db.close()
 
     return render_template("register.html")
 
@@ -55,15 +70,19 @@ def login():
         username = request.form.get("name")
         password = request.form.get("password")
 
-        db = connect_db()
-        cursor = db.cursor(dictionary=True)
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+            user = cursor.fetchone()
 
-        cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        cursor.close()
-        db.close()
+            ok, new_hash = password_hasher.verify(user["password_hash"], password) if user else (False, None)
+            if ok and new_hash:
+                # Cost setting changed since this hash was stored, so save the rehashed password
+                cursor.execute("UPDATE users SET password_hash = %s WHERE id = %s", (new_hash, user["id"]))
+                db.commit()
+            cursor.close()
 
-        if user and check_password_hash(user["password_hash"], password):
+        if ok:
             session["user_id"] = user["id"]
             session["username"] = user["username"]
             session["user_email"] = user["email"]
@@ -81,7 +100,19 @@ def dashboard():
         flash("Please log in to access the dashboard.", "danger")
         return redirect(url_for("login"))
 
-    return render_template("dashboard.html", username=session.get("username"), user_email=session.get("user_email"))
+    # Totals come from the summary tables by primary key, not a GROUP BY over orders
+    products_by_id = catalog.by_id()  # Snapshot product names before taking a connection
+    with db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        try:
+            summary = order_stats.user_summary(cursor, session["user_id"], products_by_id)
+        except mysql.connector.Error as e:
+            summary = None
+            flash(f"Unable to load order totals: {str(e)}", "danger")
+        finally:
+            cursor.close()
+
+    return render_template("dashboard.html", username=session.get("username"), user_email=session.get("user_email"), summary=summary)
 
 # Route for creating a new order
 @app.route("/create_order", methods=["GET", "POST"])
@@ -96,29 +127,33 @@ def create_order():
         order_date = request.form.get("order_date")
         user_id = session["user_id"]
 
-        db = connect_db()
-        cursor = db.cursor()
-
         try:
-            cursor.execute("INSERT INTO orders (user_id, product_id, order_date, amount) VALUES (%s, %s, %s, %s)",
-                           (user_id, product_id, order_date, amount))
-            db.commit()
-            flash("Order created successfully!", "success")
-            return redirect(url_for("dashboard"))
-        except Exception as e:
-            flash(f"An error occurred: {str(e)}", "danger")
-        finally:
-            cursor.close()
-            db.close()
-    
-    # Fetch product list for selection
-    db = connect_db()
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM products")
-    products = cursor.fetchall()
-    cursor.close()
-    db.close()
-    return render_template("create_order.html", products=products)
+            amount = Decimal(amount)
+        except (TypeError, InvalidOperation):
+            amount = None
+
+        # Validate against the cached catalog instead of querying products
+        if catalog.get(product_id) is None:
+            flash("Please select a valid product.", "danger")
+        elif amount is None or not amount.is_finite():
+            flash("Please enter a valid amount.", "danger")
+        else:
+            with db_connection() as db:
+                cursor = db.cursor()
+                try:
+                    cursor.execute("INSERT INTO orders (user_id, product_id, order_date, amount) VALUES (%s, %s, %s, %s)",
+                                   (user_id, product_id, order_date, amount))
+                    order_stats.apply_deltas(cursor, user_id, {int(product_id): (1, amount)})
+                    db.commit()
+                    flash("Order created successfully!", "success")
+                    return redirect(url_for("dashboard"))
+                except Exception as e:
+                    flash(f"An error occurred: {str(e)}", "danger")
+                finally:
+                    cursor.close()
+
+    # Product list for selection comes from the in-process catalog cache
+    return render_template("create_order.html", products=catalog.products())
 
 # Route for updating user email
 @app.route("/update_email", methods=["GET", "POST"])
@@ -130,19 +165,17 @@ def update_email():
     if request.method == "POST":
         new_email = request.form.get("email")
 
-        db = connect_db()
-        cursor = db.cursor()
-        
-        try:
-            cursor.execute("UPDATE users SET email = %s WHERE id = %s", (new_email, session["user_id"]))
-            db.commit()
-            session["user_email"] = new_email
-            flash("Email updated successfully!", "success")
-        except mysql.connector.Error as e:
-            flash(f"An error occurred: {str(e)}", "danger")
-        finally:
-            cursor.close()
-            db.close()
+        with db_connection() as db:
+            cursor = db.cursor()
+            try:
+                cursor.execute("UPDATE users SET email = %s WHERE id = %s", (new_email, session["user_id"]))
+                db.commit()
+                session["user_email"] = new_email
+                flash("Email updated successfully!", "success")
+            except mysql.connector.Error as e:
+                flash(f"An error occurred: {str(e)}", "danger")
+            finally:
+                cursor.close()
     
     return render_template("update_email.html", current_email=session["user_email"])
 
@@ -153,22 +186,22 @@ def delete_account():
         flash("Please log in to delete your account.", "danger")
         return redirect(url_for("login"))
 
-    db = connect_db()
-    cursor = db.cursor()
-    
-    try:
-        # Delete user's orders first due to foreign key constraints
-        cursor.execute("DELETE FROM orders WHERE user_id = %s", (session["user_id"],))
-        cursor.execute("DELETE FROM users WHERE id = %s", (session["user_id"],))
-        db.commit()
-        session.clear()
-        flash("Account deleted successfully.", "success")
-        return redirect(url_for("register"))
-    except mysql.connector.Error as e:
-        flash(f"An error occurred: {str(e)}", "danger")
-    finally:
-        cursor.close()
-        db.close()
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            # Delete user's orders first due to foreign key constraints
+            cursor.execute("DELETE FROM orders WHERE user_id = %s", (session["user_id"],))
+            order_stats.delete_user(cursor, session["user_id"])
+            cursor.execute("DELETE FROM users WHERE id = %s", (session["user_id"],))
+            db.commit()
+            session.clear()
+            flash("Account deleted successfully.", "success")
+            return redirect(url_for("register"))
+        except mysql.connector.Error as e:
+            flash(f"An error occurred: {str(e)}", "danger")
+        finally:
+            cursor.close()
+    return redirect(url_for("dashboard"))
 
 # Route for updating order amount
 @app.route("/update_order/<int:order_id>", methods=["GET", "POST"])
@@ -177,28 +210,35 @@ def update_order(order_id):
         flash("Please log in to update your order.", "danger")
         return redirect(url_for("login"))
     
-    db = connect_db()
-    cursor = db.cursor(dictionary=True)
-
-    if request.method == "POST":
-        new_amount = request.form.get("amount")
-        
+    with db_connection() as db:
+        cursor = db.cursor(dictionary=True)
         try:
-            cursor.execute("UPDATE orders SET amount = %s WHERE id = %s AND user_id = %s", (new_amount, order_id, session["user_id"]))
-            db.commit()
-            flash("Order amount updated successfully!", "success")
-            return redirect(url_for("dashboard"))
-        except mysql.connector.Error as e:
-            flash(f"An error occurred: {str(e)}", "danger")
+            if request.method == "POST":
+                new_amount = request.form.get("amount")
+                try:
+                    new_amount = Decimal(new_amount)
+                    if not new_amount.is_finite():
+                        raise InvalidOperation(new_amount)
+                    # Lock the row so the summary delta matches the amount being replaced
+                    current = order_stats.locked_order(cursor, order_id, session["user_id"])
+                    cursor.execute("UPDATE orders SET amount = %s WHERE id = %s AND user_id = %s", (new_amount, order_id, session["user_id"]))
+                    if current:
+                        product_id, old_amount = current
+                        order_stats.apply_deltas(cursor, session["user_id"], {product_id: (0, new_amount - old_amount)})
+                    db.commit()
+                    flash("Order amount updated successfully!", "success")
+                    return redirect(url_for("dashboard"))
+                except (TypeError, InvalidOperation):
+                    flash("Please enter a valid amount.", "danger")
+                except mysql.connector.Error as e:
+                    db.rollback()
+                    flash(f"An error occurred: {str(e)}", "danger")
+
+            # Fetch the existing order amount for display
+            cursor.execute("SELECT * FROM orders WHERE id = %s AND user_id = %s", (order_id, session["user_id"]))
+            order = cursor.fetchone()
         finally:
             cursor.close()
-            db.close()
-
-    # Fetch the existing order amount for display
-    cursor.execute("SELECT * FROM orders WHERE id = %s AND user_id = %s", (order_id, session["user_id"]))
-    order = cursor.fetchone()
-    cursor.close()
-    db.close()
     return render_template("update_order.html", order=order)
 
 # Route for deleting an order
@@ -208,21 +248,63 @@ def delete_order(order_id):
         flash("Please log in to delete an order.", "danger")
         return redirect(url_for("login"))
 
-    db = connect_db()
-    cursor = db.cursor()
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            current = order_stats.locked_order(cursor, order_id, session["user_id"])
+            cursor.execute("DELETE FROM orders WHERE id = %s AND user_id = %s", (order_id, session["user_id"]))
+            if current:
+                product_id, amount = current
+                order_stats.apply_deltas(cursor, session["user_id"], {product_id: (-1, -amount)})
+            db.commit()
+            flash("Order deleted successfully!", "success")
+        except mysql.connector.Error as e:
+            flash(f"An error occurred: {str(e)}", "danger")
+        finally:
+            cursor.close()
+    
+    return redirect(url_for("dashboard"))
+
+# Bulk import orders for the logged-in user from an uploaded CSV (product_id, order_date, amount)
+@app.route("/orders/import", methods=["POST"])
+def import_orders_view():
+    if "user_id" not in session:
+        flash("Please log in to import orders.", "danger")
+        return redirect(url_for("login"))
+
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        flash("Please choose a CSV file to import.", "danger")
+        return redirect(url_for("dashboard"))
 
     try:
-        cursor.execute("DELETE FROM orders WHERE id = %s AND user_id = %s", (order_id, session["user_id"]))
-        db.commit()
-        flash("Order deleted successfully!", "success")
-    except mysql.connector.Error as e:
+        inserted, errors = import_orders(io.TextIOWrapper(upload.stream, encoding="utf-8", newline=""), session["user_id"])
+    except (mysql.connector.Error, UnicodeDecodeError) as e:
         flash(f"An error occurred: {str(e)}", "danger")
-    finally:
-        cursor.close()
-        db.close()
-    
+        return redirect(url_for("dashboard"))
+
+    if errors:
+        details = "; ".join(f"line {line}: {reason}" for line, reason in errors[:5])
+        flash(f"Nothing imported, {len(errors)} invalid rows ({details}).", "danger")
+    else:
+        flash(f"Imported {inserted} orders.", "success")
     return redirect(url_for("dashboard"))
 
+# Stream the logged-in user's orders as CSV in the import format
+@app.route("/orders/export.csv")
+def export_orders_view():
+    if "user_id" not in session:
+        flash("Please log in to export orders.", "danger")
+        return redirect(url_for("login"))
+
+    return Response(stream_with_context(export_orders(session["user_id"])), mimetype="text/csv",
+                    headers={"Content-Disposition": "attachment; filename=my_orders.csv"})
+
+# Connection pool metrics: size, connections in use, checkout counts and wait times
+@app.route("/pool_stats")
+def pool_stats_view():
+    return jsonify(pool_stats())
+
 # Logout function
 @app.route("/logout")
 def logout():
@@ -0,0 +1,127 @@
+"""
+Bulk order import/export as CSV with columns product_id, order_date, amount
+(plus user_id when importing from the command line).
+
+    python HW2/bulk_orders.py import orders.csv [--user-id 3]
+    python HW2/bulk_orders.py export --user-id 3 > orders.csv
+"""
+import argparse
+import csv
+import sys
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+import order_stats
+from catalog import catalog
+from csv_export import stream_csv
+from db import db_connection
+
+BATCH_SIZE = 1000  # Rows per executemany call
+EXPORT_COLUMNS = ["id", "product_id", "order_date", "amount"]
+INSERT_ORDER = "INSERT INTO orders (user_id, product_id, order_date, amount) VALUES (%s, %s, %s, %s)"
+
+
+def parse_row(row, user_id, products_by_id):
+    """Validate one CSV row and return the INSERT parameters; raises ValueError with the reason.
+    products_by_id is a catalog.by_id() snapshot taken before the import's connection was checked out."""
+    user_id = user_id if user_id is not None else int(row.get("user_id") or "")
+    try:
+        product_id = int(row.get("product_id"))
+    except (TypeError, ValueError):
+        product_id = None
+    if product_id not in products_by_id:
+        raise ValueError(f"unknown product_id {row.get('product_id')!r}")
+    order_date = date.fromisoformat((row.get("order_date") or "").strip())
+    try:
+        amount = Decimal((row.get("amount") or "").strip())
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {row.get('amount')!r}")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError("amount must be positive")
+    return user_id, product_id, order_date, amount
+
+
+def insert_batch(cursor, batch):
+    """Insert a batch of orders and add them to the summary tables in the same transaction."""
+    cursor.executemany(INSERT_ORDER, batch)
+    deltas = {}
+    for user_id, product_id, _, amount in batch:
+        count, total = deltas.setdefault(user_id, {}).get(product_id, (0, 0))
+        deltas[user_id][product_id] = (count + 1, total + amount)
+    for user_id, user_deltas in deltas.items():
+        order_stats.apply_deltas(cursor, user_id, user_deltas)
+
+
+def import_orders(lines, user_id=None):
+    """
+    Stream CSV lines into orders inside a single transaction, inserting BATCH_SIZE rows per
+    executemany. Returns (inserted, errors); when any row is invalid nothing is committed and
+    errors lists (line number, reason).
+    """
+    products_by_id = catalog.by_id()  # One snapshot for the whole import, taken before checking out a connection
+    reader = csv.DictReader(lines)
+    errors = []
+    inserted = 0
+    batch = []
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            db.start_transaction()
+            for row in reader:
+                try:
+                    batch.append(parse_row(row, user_id, products_by_id))
+                except (TypeError, ValueError) as e:
+                    errors.append((reader.line_num, str(e)))
+                    continue
+                if len(batch) >= BATCH_SIZE and not errors:
+                    insert_batch(cursor, batch)
+                    inserted += len(batch)
+                    batch = []
+                elif errors:
+                    batch = []  # The import will be rolled back; stop buffering rows
+            if errors:
+                db.rollback()
+                return 0, errors
+            if batch:
+                insert_batch(cursor, batch)
+                inserted += len(batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+    return inserted, errors
+
+
+def export_orders(user_id):
+    """Yield the user's orders as CSV text chunks in the import format."""
+    return stream_csv(
+        f"SELECT {', '.join(EXPORT_COLUMNS)} FROM orders WHERE user_id = %s ORDER BY id",
+        (user_id,)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import or export HW2 orders as CSV.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_parser = sub.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--user-id", type=int, help="Owner of every row; otherwise read from a user_id column")
+    export_parser = sub.add_parser("export")
+    export_parser.add_argument("--user-id", type=int, required=True)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            inserted, errors = import_orders(f, args.user_id)
+        for line, reason in errors:
+            print(f"line {line}: {reason}", file=sys.stderr)
+        print(f"Imported {inserted} orders" if not errors else "Nothing imported")
+        sys.exit(1 if errors else 0)
+    else:
+        for chunk in export_orders(args.user_id):
+            sys.stdout.write(chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+
+from db import db_connection
+
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", 300))  # Seconds before the product list is re-read
+
+
+class ProductCatalog:
+    """In-process copy of the products table.
+
+    The list is reloaded after CATALOG_TTL seconds; code that inserts, updates or deletes
+    products must call invalidate() so this process picks up the change immediately.
+    """
+
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._products = None
+        self._by_id = {}
+        self._loaded_at = 0.0
+        self.version = 0  # Bumped on every reload
+
+    def _load(self):
+        with db_connection() as db:
+            cursor = db.cursor(dictionary=True)
+            cursor.execute("SELECT * FROM products")
+            products = cursor.fetchall()
+            cursor.close()
+        self._products = products
+        self._by_id = {product["id"]: product for product in products}
+        self._loaded_at = time.monotonic()
+        self.version += 1
+
+    def _fresh(self):
+        with self._lock:
+            if self._products is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load()
+            return self._products, self._by_id
+
+    def products(self):
+        return self._fresh()[0]
+
+    def by_id(self):
+        """Snapshot of {product id: product row}. Take it before checking out a pooled connection,
+        so a reload never needs a second connection while the first one is held."""
+        return self._fresh()[1]
+
+    def get(self, product_id):
+        """Return the product row, or None if product_id is not a known product."""
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            return None
+        return self._fresh()[1].get(product_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._products = None
+
+
+catalog = ProductCatalog()
@@ -0,0 +1,35 @@
+"""Stream a query's result set as CSV text chunks without holding it in memory."""
+import csv
+import io
+
+from db import db_connection
+
+BATCH_SIZE = 500  # Rows pulled from the unbuffered cursor at a time
+
+
+def stream_csv(query, params=(), batch_size=BATCH_SIZE):
+    """
+    Yield the result of query as CSV, headed by the selected column names.
+    Rows are read from an unbuffered cursor in batches while the caller consumes the chunks,
+    so memory stays flat no matter how many rows match.
+    """
+    with db_connection() as db:
+        cursor = db.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow([column[0] for column in cursor.description])
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                writer.writerows(batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            db.consume_results()  # Drain what is left if the consumer stopped early (e.g. client disconnected)
+            cursor.close()
@@ -1,9 +1,146 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
+from mysql.connector import pooling
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "Ab921218",
+    "database": "user_registration"
+}
+
+# Pool size (mysql.connector allows at most 32) and how long a request may wait for a free connection
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", 5))
+CHECKOUT_TIMEOUT = float(os.getenv("MYSQL_POOL_TIMEOUT", 10))
+
+
+class PoolExhausted(mysql.connector.Error):
+    """Raised when no connection is returned to the pool within CHECKOUT_TIMEOUT."""
+
+
+class TimedCursor:
+    """Cursor wrapper that reports each statement to observer(operation, status, seconds)."""
+
+    def __init__(self, cursor, observer):
+        self._cursor = cursor
+        self._observer = observer
+
+    def _timed(self, method, operation, *args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = method(operation, *args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            # Label by statement type (SELECT, INSERT, ...) to keep the number of series small
+            self._observer(operation.split(None, 1)[0].upper(), status, time.perf_counter() - start)
+
+    def execute(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.execute, operation, *args, **kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._timed(self._cursor.executemany, operation, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TimedConnection:
+    """Connection wrapper whose cursors are TimedCursors."""
+
+    def __init__(self, connection, observer):
+        self._connection = connection
+        self._observer = observer
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs), self._observer)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class ConnectionProvider:
+    """Hands out pooled MySQL connections and records checkout metrics."""
+
+    def __init__(self, size, timeout, **config):
+        self.size = size
+        self.timeout = timeout
+        self._config = config
+        self.query_observer = None  # observer(operation, status, seconds), see set_query_observer()
+        self._pool = None  # Created on first checkout so importing the app does not need MySQL
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(pool_name="hw2", pool_size=self.size, **self._config)
+            return self._pool
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        # mysql.connector raises immediately when the pool is empty, so wait on a semaphore first
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolExhausted(msg=f"No MySQL connection available within {self.timeout}s")
+        try:
+            db = self._get_pool().get_connection()
+        except Exception:
+            self._slots.release()
+            raise
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+        try:
+            yield TimedConnection(db, self.query_observer) if self.query_observer else db
+        finally:
+            db.close()  # Returns the connection to the pool; uncommitted work is rolled back
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pool_size": self.size,
+                "in_use": self.in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+provider = ConnectionProvider(POOL_SIZE, CHECKOUT_TIMEOUT, **DB_CONFIG)
+
+
+def db_connection():
+    """Context manager yielding a pooled connection: `with db_connection() as db: ...`"""
+    return provider.connection()
+
+
+def pool_stats():
+    return provider.stats()
+
 
-def connect_db():
-    return mysql.connector.connect(
-        host="localhost",
-        user="root",
-        password="Ab921218",
-        database="user_registration"
-    )
+def set_query_observer(observer):
+    """Report the duration of every statement run through db_connection() to observer."""
+    provider.query_observer = observer
@@ -1,8 +1,22 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
-from db import connect_db  # Import connect_db from db.py
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, Response, stream_with_context
+from db import db_connection  # Pooled connections from db.py
+from csv_export import stream_csv
 
 join_bp = Blueprint('join', __name__)
 
+PAGE_SIZE = 50  # Orders per page in the join view
+
+# Scoped to one user and paged by orders.id; served by idx_orders_user_id_id (see migrate.py)
+JOIN_QUERY = """
+    SELECT users.username, users.email, orders.order_date, orders.amount, products.product_name,
+           orders.id AS order_id, orders.user_id
+    FROM orders
+    JOIN users ON users.id = orders.user_id
+    JOIN products ON orders.product_id = products.id
+    WHERE orders.user_id = %s AND orders.id > %s
+    ORDER BY orders.id
+"""
+
 @join_bp.route('/join')
 def join():
     # 確保用戶已登入
@@ -10,17 +24,23 @@ def join():
         flash("Please log in to view orders.", "danger")
         return redirect(url_for("login"))
 
-    db = connect_db()
-    cursor = db.cursor(dictionary=True)
-    query = """
-        SELECT users.username, users.email, orders.order_date, orders.amount, products.product_name,
-               orders.id AS order_id, orders.user_id
-        FROM users
-        JOIN orders ON users.id = orders.user_id
-        JOIN products ON orders.product_id = products.id
-    """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    cursor.close()
-    db.close()
-    return render_template('join.html', results=results)
+    after = request.args.get('after', 0, type=int)
+    with db_connection() as db:
+        cursor = db.cursor(dictionary=True)
+        cursor.execute(JOIN_QUERY + " LIMIT %s", (session['user_id'], after, PAGE_SIZE + 1))
+        results = cursor.fetchall()
+        cursor.close()
+
+    # One extra row tells us whether there is a next page
+    next_after = results[PAGE_SIZE - 1]['order_id'] if len(results) > PAGE_SIZE else None
+    return render_template('join.html', results=results[:PAGE_SIZE], next_after=next_after)
+
+@join_bp.route('/join/export.csv')
+def export():
+    if 'user_id' not in session:
+        flash("Please log in to export orders.", "danger")
+        return redirect(url_for("login"))
+
+    user_id = session['user_id']
+    return Response(stream_with_context(stream_csv(JOIN_QUERY, (user_id, 0))), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=order_details.csv'})
@@ -0,0 +1,47 @@
+"""
+Create the summary tables and indexes the HW2 queries rely on. Safe to run repeatedly:
+
+    python HW2/migrate.py
+"""
+from db import db_connection
+from order_stats import TABLES
+
+# (table, index name, columns)
+INDEXES = [
+    # join view: WHERE orders.user_id = ? AND orders.id > ? ORDER BY orders.id
+    ("orders", "idx_orders_user_id_id", "user_id, id"),
+    # join view: JOIN products ON orders.product_id = products.id
+    ("orders", "idx_orders_product_id", "product_id"),
+]
+
+
+def existing_indexes(cursor, table):
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate():
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            for table, ddl in TABLES.items():
+                cursor.execute(ddl)  # CREATE TABLE IF NOT EXISTS
+                print(f"Ensured table {table}")
+            for table, name, columns in INDEXES:
+                # MySQL has no CREATE INDEX IF NOT EXISTS, so check information_schema first
+                if name in existing_indexes(cursor, table):
+                    print(f"{table}.{name} already exists")
+                    continue
+                cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+                print(f"Created {table}.{name} ({columns})")
+            db.commit()
+        finally:
+            cursor.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,121 @@
+"""
+Per-user order totals kept in summary tables so the dashboard reads them by primary key
+instead of running GROUP BY over orders. Every write to orders applies the matching delta
+in the same transaction; rebuild() recomputes everything from orders.
+
+    python HW2/order_stats.py rebuild
+"""
+import sys
+
+from db import db_connection
+
+# Created by migrate.py
+TABLES = {
+    "user_order_stats": """
+        CREATE TABLE IF NOT EXISTS user_order_stats (
+            user_id INT NOT NULL PRIMARY KEY,
+            order_count INT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0
+        )
+    """,
+    "user_product_stats": """
+        CREATE TABLE IF NOT EXISTS user_product_stats (
+            user_id INT NOT NULL,
+            product_id INT NOT NULL,
+            order_count INT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, product_id)
+        )
+    """,
+}
+
+UPSERT_USER = """
+    INSERT INTO user_order_stats (user_id, order_count, total_amount) VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE order_count = order_count + VALUES(order_count),
+                            total_amount = total_amount + VALUES(total_amount)
+"""
+UPSERT_PRODUCT = """
+    INSERT INTO user_product_stats (user_id, product_id, order_count, total_amount) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE order_count = order_count + VALUES(order_count),
+                            total_amount = total_amount + VALUES(total_amount)
+"""
+
+
+def apply_deltas(cursor, user_id, deltas):
+    """Add {product_id: (count_delta, amount_delta)} to the user's totals. Call before commit."""
+    if not deltas:
+        return
+    cursor.execute(UPSERT_USER, (
+        user_id,
+        sum(count for count, _ in deltas.values()),
+        sum(amount for _, amount in deltas.values()),
+    ))
+    cursor.executemany(UPSERT_PRODUCT, [
+        (user_id, product_id, count, amount) for product_id, (count, amount) in deltas.items()
+    ])
+
+
+def locked_order(cursor, order_id, user_id):
+    """Read (product_id, amount) of an order and lock the row until commit, or None."""
+    cursor.execute("SELECT product_id, amount FROM orders WHERE id = %s AND user_id = %s FOR UPDATE", (order_id, user_id))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return (row["product_id"], row["amount"]) if isinstance(row, dict) else (row[0], row[1])
+
+
+def delete_user(cursor, user_id):
+    cursor.execute("DELETE FROM user_product_stats WHERE user_id = %s", (user_id,))
+    cursor.execute("DELETE FROM user_order_stats WHERE user_id = %s", (user_id,))
+
+
+def user_summary(cursor, user_id, products_by_id):
+    """Totals for the dashboard, read by primary key (expects a dictionary cursor).
+    Product names come from products_by_id (a catalog.by_id() snapshot) rather than a join."""
+    cursor.execute("SELECT order_count, total_amount FROM user_order_stats WHERE user_id = %s", (user_id,))
+    totals = cursor.fetchone() or {"order_count": 0, "total_amount": 0}
+    cursor.execute(
+        "SELECT product_id, order_count, total_amount FROM user_product_stats "
+        "WHERE user_id = %s AND order_count > 0 ORDER BY total_amount DESC",
+        (user_id,)
+    )
+    products = []
+    for row in cursor.fetchall():
+        product = products_by_id.get(row["product_id"])
+        products.append({
+            "product_name": product["product_name"] if product else f"#{row['product_id']}",
+            "order_count": row["order_count"],
+            "total_amount": row["total_amount"],
+        })
+    return {"order_count": totals["order_count"], "total_amount": totals["total_amount"], "products": products}
+
+
+def rebuild():
+    """Recompute both summary tables from orders in one transaction."""
+    with db_connection() as db:
+        cursor = db.cursor()
+        try:
+            db.start_transaction()
+            cursor.execute("DELETE FROM user_product_stats")
+            cursor.execute("DELETE FROM user_order_stats")
+            cursor.execute(
+                "INSERT INTO user_order_stats (user_id, order_count, total_amount) "
+                "SELECT user_id, COUNT(*), COALESCE(SUM(amount), 0) FROM orders GROUP BY user_id"
+            )
+            cursor.execute(
+                "INSERT INTO user_product_stats (user_id, product_id, order_count, total_amount) "
+                "SELECT user_id, product_id, COUNT(*), COALESCE(SUM(amount), 0) FROM orders GROUP BY user_id, product_id"
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python HW2/order_stats.py rebuild")
+    rebuild()
+    print("Order summary tables rebuilt")
@@ -1,49 +1,111 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
-from pymongo import MongoClient
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, jsonify, session, flash, Response, stream_with_context
 from bson.objectid import ObjectId
-from flask_bcrypt import Bcrypt
+from bson.errors import InvalidId
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField
 from wtforms.validators import InputRequired, Length
 import requests
 import traceback
+import numpy as np
 import datetime
+import functools
+import json
+import math
+import gzip
+import hashlib
 import os
+import sys
+import tempfile
+import threading
+import time
 from dotenv import load_dotenv
 from flask_caching import Cache  # 添加缓存套件
+from dca_engine import INTERVALS, RESOLUTIONS, add_today, run_dca, series_indices, sweep_dca
+from price_ticker import PriceTicker
+from binance_client import INTERVAL_MS, BinanceClient
+from downsample import choose_interval, merge_ohlc, ohlc_columns
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from rate_limiter import BACKFILL, CHART, PRICE, WeightScheduler
+from mongo import CommandTimer, Mongo
+from kline_store import STORED_INTERVALS
+import click
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 仓库根目录的 common 套件
+from common.password_hashing import PasswordHasher
+from common import metrics
 
 # 加载环境变量
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY')  # 从环境变量中读取密钥
 
-# 设置加密和登录管理
-bcrypt = Bcrypt(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'
+# 设置加密和登录管理（bcrypt 在有上限的线程池中计算，成本由 BCRYPT_ROUNDS 设置）
+password_hasher = PasswordHasher.from_env('bcrypt')
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
 login_manager.login_message = "Please log in to access this page."
 
-# 初始化缓存
-cache = Cache(app, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 300})
-# 可调整 CACHE_DEFAULT_TIMEOUT 以设置默认的缓存时间
-
-# MongoDB 连接
-MONGO_URI = os.getenv("MONGODB_URI")
-client = MongoClient(MONGO_URI)
-db = client['my_database']  # 替换成你的数据库名称
-users_collection = db['users']  # 用户数据的集合
-logs_collection = db['startup_log']  # 日志数据的集合
-
-# 创建管理员账号
-admin_account = users_collection.find_one({'username': 'admin'})
-if not admin_account:
-    hashed_password = bcrypt.generate_password_hash("Ab921218").decode('utf-8')
-    users_collection.insert_one({'_id': 'admin', 'username': 'admin', 'password': hashed_password, 'is_admin': True})
+def cache_config():
+    """
+    缓存后端由环境变量选择，默认 FileSystemCache，使同一主机上的所有 gunicorn worker 共享缓存：
+      CACHE_TYPE=FileSystemCache  CACHE_DIR 下每个键一个文件，条目数超过 CACHE_THRESHOLD 时删除过期及最旧的条目
+      CACHE_TYPE=RedisCache       CACHE_REDIS_URL 指向的 Redis（需另装 redis 套件），容量由服务器的 maxmemory + allkeys-lru 限制
+      CACHE_TYPE=SimpleCache      进程内缓存，仅适合单进程开发
+    """
+    cache_type = os.getenv('CACHE_TYPE', 'FileSystemCache')
+    config = {
+        'CACHE_TYPE': cache_type,
+        'CACHE_DEFAULT_TIMEOUT': 300,  # 可调整以设置默认的缓存时间
+        'CACHE_THRESHOLD': int(os.getenv('CACHE_THRESHOLD', 500)),  # 最多保留的条目数
+    }
+    if cache_type == 'FileSystemCache':
+        config['CACHE_DIR'] = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'hw3-cache'))
+    elif cache_type == 'RedisCache':
+        config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        config['CACHE_KEY_PREFIX'] = 'hw3:'
+    return config
+
+# 初始化缓存（在 create_app 中绑定应用）
+cache = Cache()
+
+# MongoDB 连接：第一次查询时才建立；每个命令的耗时记录到 /metrics
+mongo = Mongo(event_listeners=[CommandTimer(metrics.db_observer('mongodb'))])
+
+# 所有页面与 API 路由；create_app 将其注册到应用上
+main = Blueprint('main', __name__, cli_group=None)
+
+# 建立管理员账号，部署时执行一次（Procfile 的 release 阶段）：flask --app app init-db
+# 索引由各进程第一次连接 MongoDB 时自动建立（见 mongo.py）
+@main.cli.command('init-db')
+@click.option('--admin-password', default=lambda: os.getenv('ADMIN_PASSWORD', 'Ab921218'))
+def init_db(admin_password):
+    if not mongo.users.find_one({'username': 'admin'}):
+        hashed_password = password_hasher.hash(admin_password)
+        mongo.users.insert_one({'_id': 'admin', 'username': 'admin', 'password': hashed_password, 'is_admin': True})
+        click.echo('Created admin account')
+    click.echo('Database initialized')
 
 # Binance API URL
-BASE_URL = 'https://data-api.binance.vision'
+BASE_URL = os.getenv('BINANCE_BASE_URL', 'https://data-api.binance.vision')  # 基准测试时指向本地替身
+# 所有 Binance 请求共用的连接池客户端
+binance = BinanceClient(
+    BASE_URL,
+    pool_size=int(os.getenv('BINANCE_POOL_SIZE', 10)),
+    max_retries=int(os.getenv('BINANCE_MAX_RETRIES', 3)),
+    backoff_factor=float(os.getenv('BINANCE_BACKOFF', 0.5)),
+    fetch_workers=int(os.getenv('BINANCE_FETCH_WORKERS', 4)),
+    observer=metrics.upstream_observer('binance'),
+    # 按请求权重排队：实时价格优先，其次图表，回补历史数据最后，额度以 Binance 回报的已用权重校准
+    scheduler=WeightScheduler(
+        weight_limit=int(os.getenv('BINANCE_WEIGHT_LIMIT', 6000)),
+        observer=metrics.queue_observer('binance')
+    )
+)
+MAX_CHART_POINTS = 2000  # K 线图单次最多返回的点数
+# 相同的上游请求（价格、同一区间的 K 线）同时只发出一次，并发的调用者共享结果
+upstream_flight = SingleFlight()
+chart_flight = SingleFlight()
 
 class User(UserMixin):
     def __init__(self, user_id, username, is_admin=False):
@@ -51,13 +113,26 @@ class User(UserMixin):
         self.username = username
         self.is_admin = is_admin
 
+# flask-login 每个请求都会调用 load_user，先查进程内缓存再查 MongoDB
+user_cache = TTLCache(maxsize=int(os.getenv('USER_CACHE_SIZE', 1024)), ttl=float(os.getenv('USER_CACHE_TTL', 60)))
+
 @login_manager.user_loader
 def load_user(user_id):
-    user_data = users_collection.find_one({"_id": user_id})
+    user = user_cache.get(user_id)
+    metrics.cache_lookup('user', user is not None)
+    if user is not None:
+        return user
+    user_data = mongo.users.find_one({"_id": user_id})
     if user_data:
-        return User(user_id=user_data['_id'], username=user_data['username'], is_admin=user_data.get('is_admin', False))
+        user = User(user_id=user_data['_id'], username=user_data['username'], is_admin=user_data.get('is_admin', False))
+        user_cache.set(user_id, user)
+        return user
     return None
 
+def invalidate_user(user_id):
+    """用户数据（如 is_admin）变更后调用，使本进程的缓存失效"""
+    user_cache.invalidate(user_id)
+
 # 表单定义
 class RegisterForm(FlaskForm):
     username = StringField('Username', validators=[InputRequired(), Length(min=3, max=15)])
@@ -68,41 +143,47 @@ class LoginForm(FlaskForm):
     password = PasswordField('Password', validators=[InputRequired()])
 
 # 注册页面
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
         username = form.username.data.strip()
         password = form.password.data.strip()
 
-        if users_collection.find_one({'_id': username}):
+        if mongo.users.find_one({'_id': username}):
             flash("Username already exists!", "error")
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
-        hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+        hashed_password = password_hasher.hash(password)
         user_id = username  # 使用用户名作为自定义的 _id
-        users_collection.insert_one({'_id': user_id, 'username': username, 'password': hashed_password, 'is_admin': False})
+        mongo.users.insert_one({'_id': user_id, 'username': username, 'password': hashed_password, 'is_admin': False})
+        invalidate_user(user_id)
         login_user(User(user_id=user_id, username=username))
         flash("Registration successful!", "success")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     return render_template('register.html', form=form)
 
 # 登录页面
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
         username = form.username.data.strip()
         password = form.password.data.strip()
 
-        user_data = users_collection.find_one({'_id': username})
+        user_data = mongo.users.find_one({'_id': username})
         if user_data:
-            if bcrypt.check_password_hash(user_data['password'], password):
+            ok, new_hash = password_hasher.verify(user_data['password'], password)
+            if ok:
+                if new_hash:
+                    # 成本设置已改变，以新成本重新哈希后写回
+                    mongo.users.update_one({'_id': user_data['_id']}, {'$set': {'password': new_hash}})
                 user = User(user_id=user_data['_id'], username=username, is_admin=user_data.get('is_admin', False))
+                user_cache.set(user.id, user)  # 登录时已读取最新数据，顺便刷新缓存
                 login_user(user)
                 flash("Login successful!", "success")
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             else:
                 flash("Incorrect password.", "error")
         else:
@@ -110,110 +191,171 @@ def login():
 
     return render_template('login.html', form=form)
 
+# 用户缓存命中率（仅限管理员）
+@main.route('/api/user-cache/stats')
+@login_required
+def user_cache_stats():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(user_cache.stats())
+
 # 登出
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash("You have been logged out.", "info")
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-# 將緩存時間從 60 秒縮短為 5 秒
-@cache.cached(timeout=5)
-def get_bitcoin_price():
-    """获取实时比特币价格"""
-    url = f'{BASE_URL}/api/v3/ticker/price'
+def fetch_bitcoin_price():
+    """向 Binance 请求实时比特币价格，请求失败时抛出异常"""
     params = {'symbol': 'BTCUSDT'}
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    proxies = {"http": None, "https": None}
+    data = binance.get('/api/v3/ticker/price', params=params, timeout=5, priority=PRICE).json()
+    return float(data['price'])
 
-    try:
-        response = requests.get(url, params=params, headers=headers, proxies=proxies, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-        price = float(data['price'])
+PRICE_TICKER_INTERVAL = float(os.getenv('PRICE_TICKER_INTERVAL', 2))
+
+def shared_bitcoin_price():
+    """各进程的轮询线程先读共享缓存，缓存过期时才向 Binance 请求，整台主机每个周期约只请求一次"""
+    price = cache.get('bitcoin_price')
+    metrics.cache_lookup('bitcoin_price', price is not None)
+    if price is None:
+        price = upstream_flight.do('ticker/price', fetch_bitcoin_price)
+        cache.set('bitcoin_price', price, timeout=max(1, int(PRICE_TICKER_INTERVAL)))
+    return price
+
+# 每个进程一个后台线程轮询价格，取代每个请求各自到期的 5 秒缓存
+price_ticker = PriceTicker(shared_bitcoin_price, interval=PRICE_TICKER_INTERVAL)
+
+def get_bitcoin_price():
+    """获取实时比特币价格"""
+    price = price_ticker.latest(max_age=10)
+    if price is not None:
         return price
+    try:
+        return shared_bitcoin_price()  # 后台线程尚未取得价格时直接取一次
     except requests.exceptions.RequestException as e:
         print(f"Failed to retrieve Bitcoin price: {e}")
         traceback.print_exc()
         return 0  # 修改此处以返回数字 0，避免返回字符串引发后续问题
 
+def fetch_klines(symbol, interval, start_time, end_time_ms, priority=CHART):
+    """从 Binance 抓取 [start_time, end_time_ms] 的 K 线（按窗口并行下载），请求失败时抛出异常"""
+    key = ('klines', symbol, interval, start_time, end_time_ms)
+    return upstream_flight.do(key, binance.klines, symbol, interval, start_time, end_time_ms, priority)
+
 # 新增一个独立的 get_historical_data 函数，并添加缓存
+@metrics.count_lookups('historical_data')
 @cache.memoize(timeout=3600)  # 缓存 1 小时，可根据需要调整
 def get_historical_data(symbol, interval, start_time, end_time_ms):
-    """获取历史数据，并进行缓存"""
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    proxies = {"http": None, "https": None}
-    all_data = []
-    limit = 1000
-    current_start_time = start_time
-
-    while current_start_time < end_time_ms:
-        params = {
-            'symbol': symbol,
-            'interval': interval,
-            'startTime': current_start_time,
-            'endTime': end_time_ms,
-            'limit': limit
-        }
-        try:
-            response = requests.get(f'{BASE_URL}/api/v3/klines', params=params, headers=headers, proxies=proxies, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            if not data:
-                break
-            all_data.extend(data)
-            current_start_time = data[-1][0] + 1
-        except requests.exceptions.RequestException as e:
-            print("API request error:", e)
-            traceback.print_exc()
-            return []
-
-    return all_data
-
-@app.route('/')
+    """
+    获取历史数据：优先读取本地 K 线存储，只向 Binance 补抓缺失的区间。
+    抓取失败（含等待限流额度超时）时返回 None：memoize 不缓存 None，上游恢复后下次调用会重新抓取
+    """
+    metrics.cache_miss('historical_data')
+    try:
+        # DCA 等长区间的回补以最低优先级排队，不占用价格与图表请求的额度
+        backfill = functools.partial(fetch_klines, priority=BACKFILL)
+        return mongo.kline_store.get(symbol, interval, start_time, end_time_ms, backfill)
+    except requests.exceptions.RequestException as e:
+        print("API request error:", e)
+        traceback.print_exc()
+        return None
+
+LOGS_PAGE_SIZE = int(os.getenv('LOGS_PAGE_SIZE', 20))  # 每页日志数
+LOG_SUMMARY_LENGTH = 200  # 列表中 description 只显示前 200 个字符
+
+def list_logs(query, after=None, limit=LOGS_PAGE_SIZE):
+    """以 `_id` 做 keyset 分页，只取列表显示的字段；返回 (logs, next_cursor)"""
+    if after:
+        query = {**query, '_id': {'$gt': ObjectId(after)}}
+    pipeline = [
+        {'$match': query},
+        {'$sort': {'_id': 1}},
+        {'$limit': limit + 1},  # 多取一笔以判断是否还有下一页
+        {'$project': {
+            'name': 1,
+            'user_id': 1,
+            'description': {'$substrCP': [{'$ifNull': ['$description', '']}, 0, LOG_SUMMARY_LENGTH]}
+        }}
+    ]
+    # 转换每个日志的 `_id` 为字符串，安全地处理缺失的 `user_id`
+    logs = [
+        {'_id': str(log['_id']), 'name': log.get('name', ''), 'description': log['description'],
+         'user_id': str(log.get('user_id', ''))}
+        for log in mongo.logs.aggregate(pipeline)
+    ]
+    next_cursor = logs[limit - 1]['_id'] if len(logs) > limit else None
+    return logs[:limit], next_cursor
+
+def logs_query(mine):
+    """只看自己的日志时以 user_id 过滤，由 (user_id, _id) 复合索引支持"""
+    return {'user_id': current_user.id} if mine else {}
+
+def can_manage(log):
+    return current_user.is_authenticated and (log['user_id'] == current_user.id or current_user.is_admin)
+
+@main.route('/')
 def index():
-    """主页显示所有日志和实时比特币价格"""
+    """主页显示第一页日志和实时比特币价格，其余日志由 /api/logs 滚动加载；?mine=1 只显示自己的日志"""
     try:
-        logs = logs_collection.find()
-        # 转换每个日志的 `_id` 为字符串，安全地处理缺失的 `user_id`
-        logs = [{**log, "_id": str(log["_id"]), "user_id": str(log.get("user_id", ""))} for log in logs]
+        mine = request.args.get('mine') == '1' and current_user.is_authenticated
+        logs, next_cursor = list_logs(logs_query(mine))
         bitcoin_price = get_bitcoin_price()
-        return render_template('index.html', logs=logs, bitcoin_price=bitcoin_price)
+        return render_template('index.html', logs=logs, next_cursor=next_cursor, mine=mine, bitcoin_price=bitcoin_price)
     except Exception as e:
         print(f"Error loading index page: {e}")
         traceback.print_exc()
         flash("An error occurred while loading the main page.", "error")
-        return redirect(url_for('login'))  # 或自定义错误页面
+        return redirect(url_for('main.login'))  # 或自定义错误页面
+
+# 无限滚动用的日志分页 API
+@main.route('/api/logs')
+def logs_api():
+    after = request.args.get('after')
+    limit = min(max(request.args.get('limit', LOGS_PAGE_SIZE, type=int), 1), 100)
+    mine = request.args.get('mine') == '1'
+    if mine and not current_user.is_authenticated:
+        return jsonify({'error': 'Login required'}), 401
+    try:
+        logs, next_cursor = list_logs(logs_query(mine), after=after, limit=limit)
+    except InvalidId:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    for log in logs:
+        log['detail_url'] = url_for('main.detail', log_id=log['_id'])
+        if can_manage(log):
+            log['edit_url'] = url_for('main.edit', log_id=log['_id'])
+            log['delete_url'] = url_for('main.delete', log_id=log['_id'])
+    return jsonify({'logs': logs, 'next_cursor': next_cursor})
 
 # 创建新日志（仅限登录用户）
-@app.route('/create', methods=['GET', 'POST'])
+@main.route('/create', methods=['GET', 'POST'])
 @login_required
 def create():
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
         description = request.form.get('description', '').strip()
         if name and description:
-            logs_collection.insert_one({
+            mongo.logs.insert_one({
                 'name': name,
                 'description': description,
                 'user_id': current_user.id  # 保存当前登录用户的ID
             })
             flash("Log created successfully!", "success")
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash("Name and Description are required.", "error")
             return render_template('create.html')
     return render_template('create.html')
 
-@app.route('/edit/<log_id>', methods=['GET', 'POST'])
+@main.route('/edit/<log_id>', methods=['GET', 'POST'])
 @login_required
 def edit(log_id):
     try:
-        log = logs_collection.find_one({'_id': ObjectId(log_id)})
+        log = mongo.logs.find_one({'_id': ObjectId(log_id)})
         if not log:
             flash("Log not found.", "error")
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # 將 log['_id'] 轉換為字串
         log['_id'] = str(log['_id'])
@@ -224,19 +366,19 @@ def edit(log_id):
         # 只有當前用戶是所有者或管理員才能編輯
         if log_user_id != current_user.id and not current_user.is_admin:
             flash("You do not have permission to edit this log.", "error")
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # 處理表單提交
         if request.method == 'POST':
             name = request.form.get('name', '').strip()
             description = request.form.get('description', '').strip()
             if name and description:
-                logs_collection.update_one(
+                mongo.logs.update_one(
                     {'_id': ObjectId(log_id)},
                     {'$set': {'name': name, 'description': description}}
                 )
                 flash("Log updated successfully!", "success")
-                return redirect(url_for('index'))
+                return redirect(url_for('main.index'))
             else:
                 flash("Name and Description are required.", "error")
         
@@ -247,15 +389,15 @@ def edit(log_id):
         print(f"Error in edit function: {e}")
         traceback.print_exc()
         flash("An error occurred while editing the log.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-@app.route('/detail/<log_id>')
+@main.route('/detail/<log_id>')
 def detail(log_id):
     try:
-        log = logs_collection.find_one({'_id': ObjectId(log_id)})
+        log = mongo.logs.find_one({'_id': ObjectId(log_id)})
         if not log:
             flash("Log not found", "error")
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         
         # 將 log['_id'] 轉換為字串
         log['_id'] = str(log['_id'])
@@ -265,25 +407,25 @@ def detail(log_id):
         print(f"Error in detail function: {e}")
         traceback.print_exc()
         flash("An error occurred while viewing the log.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
 # 在 delete 函数中增加安全的 user_id 检查
-@app.route('/delete/<log_id>', methods=['POST'])
+@main.route('/delete/<log_id>', methods=['POST'])
 @login_required
 def delete(log_id):
-    log = logs_collection.find_one({'_id': ObjectId(log_id)})
-    log_user_id = str(log.get('user_id', ""))  # 安全地获取 user_id
-    
-    # 增加检查
-    if not log or (log_user_id != current_user.id and not current_user.is_admin):
+    # 非管理员只能删除自己的日志，所有权直接作为删除条件
+    query = {'_id': ObjectId(log_id)}
+    if not current_user.is_admin:
+        query['user_id'] = current_user.id
+
+    if mongo.logs.delete_one(query).deleted_count == 0:
         flash("You do not have permission to delete this log.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-    logs_collection.delete_one({'_id': ObjectId(log_id)})
     flash("Log deleted successfully.", "success")
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/dca', methods=['GET', 'POST'])
+@main.route('/dca', methods=['GET', 'POST'])
 def dca():
     """DCA 计算页面"""
     if request.method == 'POST':
@@ -301,8 +443,8 @@ def dca():
 
         try:
             amount = float(amount)
-            if amount <= 0:
-                raise ValueError("Amount must be positive.")
+            if not math.isfinite(amount) or amount <= 0:
+                raise ValueError("Amount must be a positive number.")
         except ValueError as ve:
             error = f"Invalid amount: {ve}"
             return render_template('dca.html', error=error)
@@ -324,6 +466,7 @@ def dca():
             error = "An error occurred during calculation. Please try again."
             return render_template('dca.html', error=error)
 
+        # 页面只含汇总数字，图表数据由 /api/dca/series 按画布宽度取样后再加载
         return render_template('dca_result.html',
                                start_date=start_date_str,
                                end_date=end_date_str,
@@ -332,8 +475,8 @@ def dca():
                                total_invested=total_invested,
                                total_value=total_value,
                                roi_percentage=roi_percentage,
-                               investment_dates=investment_dates,
-                               investment_values=investment_values)
+                               series_url=url_for('main.dca_series_api', start=start_date_str, end=end_date_str,
+                                                  interval=interval, amount=amount))
 
     last_date_range = session.get('last_date_range', '')
     last_interval = session.get('last_interval', '')
@@ -344,145 +487,363 @@ def dca():
                            interval=last_interval, 
                            amount=last_amount)
 
-# 在 calculate_dca 函数中，对 Binance API 请求进行缓存
+DCA_CACHE_TTL = int(os.getenv('DCA_CACHE_TTL', 86400))  # 键中已含日期，过期时间只用于回收空间
+
+@metrics.count_lookups('dca_history')
+@cache.memoize(timeout=DCA_CACHE_TTL)
+def dca_history(start_date, end_date, interval, amount_per_interval, today):
+    """
+    DCA 中只依赖已收盘日 K 线（截至 today 前一日）的部分：(total_invested, total_btc, dates, values, invested)。
+    today 作为缓存键的一部分：新的日 K 线收盘后自然换成新键。今日由 dca_with_today 以即时价格补上。
+    取不到历史数据时返回 None（不会被缓存）。
+    """
+    metrics.cache_miss('dca_history')
+    last_closed = today - datetime.timedelta(days=1)
+    if start_date > last_closed:
+        return 0, 0.0, [], [], []  # 从今日开始，没有已收盘的部分
+    start_time = int(datetime.datetime.combine(start_date, datetime.datetime.min.time()).timestamp() * 1000)
+    end_time_ms = int(datetime.datetime.combine(last_closed, datetime.datetime.min.time()).timestamp() * 1000)
+    all_data = get_historical_data('BTCUSDT', '1d', start_time, end_time_ms)
+    if not all_data:
+        return None
+    # 以 NumPy 陣列計算買入日與累計持有的 BTC
+    return run_dca(all_data, start_date, min(end_date, last_closed), interval, amount_per_interval, last_closed)
+
+def dca_with_today(start_date, end_date, interval, amount_per_interval, today, current_price):
+    """已收盘部分取自 dca_history 的缓存，再以即时价格补上今日的买入与持仓市值；取不到历史数据时返回 None"""
+    history = dca_history(start_date, end_date, interval, amount_per_interval, today)
+    if history is None:
+        return None
+    return add_today(history, start_date, end_date, interval, amount_per_interval, today, current_price)
+
+def dca_dates(start_date_str, end_date_str):
+    """解析日期区间并把结束日期限制在今日以内，返回 (start_date, end_date, today)；格式错误时抛出 ValueError"""
+    start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
+    end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date()
+    today = datetime.datetime.now().date()
+    return start_date, min(end_date, today), today
+
 def calculate_dca(start_date_str, end_date_str, interval, amount_per_interval):
-    """計算定期定額投資回報"""
-    symbol = 'BTCUSDT'
+    """計算定期定額投資回報；歷史部分取自 dca_history 的快取，只有最後一步乘上即時價格"""
     try:
-        start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d')
-        end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d')
+        start_date, end_date, today = dca_dates(start_date_str, end_date_str)
     except ValueError as e:
         print(f"Date parsing error: {e}")
         return 0, 0, 0, [], []
 
-    # 將結束日期時間設置為當天的23:59:59，確保包含當天的數據
-    end_date = end_date.replace(hour=23, minute=59, second=59)
-
-    # 調整結束日期為今日
-    today = datetime.datetime.now().date()
-    if end_date.date() > today:
-        end_date = datetime.datetime.combine(today, datetime.datetime.min.time())
-    else:
-        end_date = datetime.datetime.combine(end_date.date(), datetime.datetime.min.time())
-
-    # 創建從開始日期到今日的日期列表
-    all_dates = []
-    current_date = start_date.date()
-    while current_date <= today:
-        all_dates.append(current_date)
-        current_date += datetime.timedelta(days=1)
+    current_price = get_bitcoin_price()
+    if isinstance(current_price, str):
+        current_price = 0.0
 
-    # 獲取所有日期的歷史價格
-    start_time = int(start_date.timestamp() * 1000)
-    end_time_ms = int(datetime.datetime.combine(today, datetime.datetime.min.time()).timestamp() * 1000)
-    all_data = get_historical_data(symbol, '1d', start_time, end_time_ms)
-    if not all_data:
+    history = dca_with_today(start_date, end_date, interval, amount_per_interval, today, current_price)
+    if history is None:
         return 0, 0, 0, [], []
+    total_invested, total_btc, investment_dates_formatted, investment_values, _ = history
 
-    date_price_map = {}
-    for item in all_data:
-        date = datetime.datetime.fromtimestamp(item[0] / 1000).date()
-        closing_price = float(item[4])
-        date_price_map[date] = closing_price
-
-    # 設置投資日期集合
-    investment_dates = []
-    current_date = start_date
-
-    while current_date <= end_date:
-        investment_dates.append(current_date)
-        if interval == 'daily':
-            current_date += datetime.timedelta(days=1)
-        elif interval == 'weekly':
-            current_date += datetime.timedelta(weeks=1)
-        elif interval == 'monthly':
-            month = current_date.month + 1
-            year = current_date.year
-            if month > 12:
-                month = 1
-                year += 1
-            day = min(current_date.day, 28)
-            try:
-                current_date = current_date.replace(year=year, month=month, day=day)
-            except ValueError as e:
-                print(f"Date adjustment error: {e}")
-                break
-        else:
-            print("Invalid interval")
-            break
+    total_value = total_btc * current_price
+    roi_percentage = ((total_value - total_invested) / total_invested) * 100 if total_invested != 0 else 0
 
-    investment_dates_set = set([date.date() for date in investment_dates])
+    return round(total_invested, 2), round(total_value, 2), round(roi_percentage, 2), investment_dates_formatted, investment_values
 
-    total_btc = 0.0
-    investment_dates_formatted = []
-    investment_values = []
+@main.route('/api/dca')
+def dca_api():
+    """
+    参数：start、end (YYYY-MM-DD)、interval (daily/weekly/monthly)、amount；
+    series=1 时附带每次买入的日期与当时持仓价值。
+    """
+    try:
+        start_date, end_date, today = dca_dates(request.args.get('start', ''), request.args.get('end', ''))
+        interval = request.args.get('interval', '')
+        amount = float(request.args.get('amount', ''))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameters: {e}'}), 400
+    if interval not in INTERVALS or not (math.isfinite(amount) and amount > 0) or start_date > end_date:
+        return jsonify({'error': 'Invalid parameters'}), 400
 
-    for date in all_dates:
-        if date in investment_dates_set:
-            price = date_price_map.get(date)
-            if price:
-                btc_bought = amount_per_interval / price
-                total_btc += btc_bought
-        price = date_price_map.get(date)
-        if price:
-            current_value = total_btc * price
-            investment_dates_formatted.append(date.strftime('%Y-%m-%d'))
-            investment_values.append(round(current_value, 2))
+    current_price = get_bitcoin_price()
+    history = dca_with_today(start_date, end_date, interval, amount, today, current_price)
+    if history is None:
+        return jsonify({'error': 'Unable to fetch data'}), 500
+    total_invested, total_btc, dates, values, invested = history
 
-    total_invested = amount_per_interval * len(investment_dates)
+    total_value = total_btc * current_price
+    result = {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'interval': interval,
+        'amount': amount,
+        'total_invested': round(total_invested, 2),
+        'total_btc': total_btc,
+        'current_price': current_price,
+        'total_value': round(total_value, 2),
+        'roi_percentage': round((total_value - total_invested) / total_invested * 100, 2) if total_invested else 0
+    }
+    if request.args.get('series') == '1':
+        result['dates'] = dates
+        result['values'] = values
+        result['invested'] = invested
+    return jsonify(result)
+
+MAX_DCA_SERIES_POINTS = 5000
+
+@main.route('/api/dca/series')
+def dca_series_api():
+    """
+    DCA 结果图表的数据，与 /api/dca 参数相同，另可指定
+    resolution (daily/weekly/monthly) 与 points（最多返回的点数）。
+    """
+    try:
+        start_date, end_date, today = dca_dates(request.args.get('start', ''), request.args.get('end', ''))
+        interval = request.args.get('interval', '')
+        amount = float(request.args.get('amount', ''))
+        points = request.args.get('points', MAX_DCA_SERIES_POINTS, type=int)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameters: {e}'}), 400
+    resolution = request.args.get('resolution', 'daily')
+    if interval not in INTERVALS or resolution not in RESOLUTIONS or not (math.isfinite(amount) and amount > 0) or start_date > end_date:
+        return jsonify({'error': 'Invalid parameters'}), 400
+    points = min(max(points, 2), MAX_DCA_SERIES_POINTS)
 
+    # 序列只随已收盘的日 K 线与今日的即时价格改变，以参数、today 与价格作为 ETag；重新验证时不必读取历史数据
     current_price = get_bitcoin_price()
-    if isinstance(current_price, str):
-        current_price = 0.0
+    etag = hashlib.md5(f'{request.query_string.decode()}:{today}:{current_price}'.encode()).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
 
-    total_value = total_btc * current_price
-    roi_percentage = ((total_value - total_invested) / total_invested) * 100 if total_invested != 0 else 0
+    history = dca_with_today(start_date, end_date, interval, amount, today, current_price)
+    if history is None:
+        return jsonify({'error': 'Unable to fetch data'}), 500
+    _, _, dates, values, invested = history
+
+    idx = series_indices(dates, resolution, points)
+    return compressed_json({
+        'resolution': resolution,
+        'dates': [dates[i] for i in idx],
+        'values': [values[i] for i in idx],
+        'invested': [invested[i] for i in idx]
+    }, etag)
+
+MAX_SWEEP_STARTS = 1000  # sweep 一次最多计算的起始日数
+
+@main.route('/api/dca/sweep')
+def dca_sweep_api():
+    """
+    参数：start、end (YYYY-MM-DD)、start_step (day/week/month，起始日的间隔)、
+    或直接以 starts 传入逗号分隔的起始日；intervals、amounts 均为逗号分隔。
+    """
+    today = datetime.datetime.now().date()
+    try:
+        end_date = min(datetime.date.fromisoformat(request.args.get('end', today.isoformat())), today)
+        if request.args.get('starts'):
+            start_dates = sorted(datetime.date.fromisoformat(s) for s in request.args['starts'].split(','))
+        else:
+            start_date = datetime.date.fromisoformat(request.args.get('start', '2017-08-17'))
+            start_dates = sweep_start_dates(start_date, end_date, request.args.get('start_step', 'month'))
+        intervals = request.args.get('intervals', ','.join(INTERVALS)).split(',')
+        amounts = [float(a) for a in request.args.get('amounts', '100').split(',')]
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameters: {e}'}), 400
 
-    return round(total_invested, 2), round(total_value, 2), round(roi_percentage, 2), investment_dates_formatted, investment_values
+    if not start_dates or start_dates[0] > end_date:
+        return jsonify({'error': 'No start dates within the selected range'}), 400
+    if len(start_dates) > MAX_SWEEP_STARTS:
+        return jsonify({'error': f'Too many start dates (max {MAX_SWEEP_STARTS})'}), 400
+    if any(i not in INTERVALS for i in intervals) or any(not (math.isfinite(a) and a > 0) for a in amounts):
+        return jsonify({'error': 'Invalid parameters'}), 400
 
-@app.route('/api/bitcoin-historical-data')
+    start_time = int(datetime.datetime.combine(start_dates[0], datetime.datetime.min.time()).timestamp() * 1000)
+    end_time_ms = int(datetime.datetime.combine(today, datetime.datetime.min.time()).timestamp() * 1000)
+    all_data = get_historical_data('BTCUSDT', '1d', start_time, end_time_ms)
+    if not all_data:
+        return jsonify({'error': 'Unable to fetch data'}), 500
+
+    grid = sweep_dca(all_data, start_dates, end_date, intervals, amounts, today)
+    total_value = grid['total_btc'] * get_bitcoin_price()
+    invested = grid['total_invested']
+    roi = np.divide(total_value - invested, invested, out=np.zeros_like(invested), where=invested != 0) * 100
+
+    return jsonify({
+        'starts': [d.isoformat() for d in start_dates],
+        'intervals': intervals,
+        'amounts': amounts,
+        'total_invested': np.round(invested, 2).tolist(),
+        'total_value': np.round(total_value, 2).tolist(),
+        'roi_percentage': np.round(roi, 2).tolist()
+    })
+
+def sweep_start_dates(start_date, end_date, step):
+    """生成 sweep 的起始日列表；超过 MAX_SWEEP_STARTS 个时停止生成并抛出 ValueError"""
+    if step == 'day':
+        delta = lambda d: d + datetime.timedelta(days=1)
+    elif step == 'week':
+        delta = lambda d: d + datetime.timedelta(weeks=1)
+    elif step == 'month':
+        delta = lambda d: (d.replace(day=1) + datetime.timedelta(days=32)).replace(day=min(start_date.day, 28))
+    else:
+        raise ValueError(f"invalid start_step '{step}'")
+    dates = []
+    current = start_date
+    while current <= end_date:
+        if len(dates) == MAX_SWEEP_STARTS:
+            raise ValueError(f"too many start dates (max {MAX_SWEEP_STARTS}); use a larger start_step or a later start")
+        dates.append(current)
+        current = delta(current)
+    return dates
+
+def align_to_interval(interval, start_time, end_time):
+    """
+    把毫秒时间戳向下取整到 K 线开盘时间，使同一预设范围的请求得到相同的键而能合并。
+    只处理开盘时间与 epoch 对齐的周期（STORED_INTERVALS）：结束时间取整后仍包含同一根 K 线，结果不变；
+    开始时间取整最多多包含开头那根 K 线。'3d'、'1w'（周一开盘）等周期不对齐，原样返回。
+    """
+    if interval not in STORED_INTERVALS:
+        return start_time, end_time
+    step = INTERVAL_MS[interval]
+    return (start_time // step * step if start_time else start_time,
+            end_time // step * step if end_time else end_time)
+
+def chart_columns(symbol, interval, start_time, end_time, points):
+    rows = mongo.kline_store.get(symbol, interval, start_time, end_time, fetch_klines)
+    return merge_ohlc(ohlc_columns(rows), points)
+
+@main.route('/api/bitcoin-historical-data')
 def bitcoin_historical_data():
     interval = request.args.get('interval', '1d')
     start_time = request.args.get('startTime')
     end_time = request.args.get('endTime')
+    points = request.args.get('points', type=int)
 
     symbol = 'BTCUSDT'
-    headers = {'User-Agent': 'Mozilla/5.0'}
-    proxies = {"http": None, "https": None}
-
-    params = {
-        'symbol': symbol,
-        'interval': interval,
-        'startTime': start_time,
-        'endTime': end_time,
-        'limit': 1000
-    }
 
     try:
-        response = requests.get(f'{BASE_URL}/api/v3/klines', params=params, headers=headers, proxies=proxies, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        prices = []
-        for item in data:
-            prices.append({
-                'x': item[0],
-                'o': float(item[1]),
-                'h': float(item[2]),
-                'l': float(item[3]),
-                'c': float(item[4])
-            })
-        return jsonify({'prices': prices})
+        if points:
+            # 由服务器选择基础周期，抓取整个区间后合并成不超过 points 根 K 线
+            points = min(max(points, 10), MAX_CHART_POINTS)
+            end_time = int(end_time) if end_time else int(datetime.datetime.now().timestamp() * 1000)
+            start_time = int(start_time) if start_time else end_time - 24 * 60 * 60 * 1000
+            interval = choose_interval(start_time, end_time, points)
+            start_time, end_time = align_to_interval(interval, start_time, end_time)
+            columns = chart_flight.do((symbol, interval, start_time, end_time, points),
+                                      chart_columns, symbol, interval, start_time, end_time, points)
+        else:
+            start_time, end_time = align_to_interval(interval, start_time and int(start_time), end_time and int(end_time))
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': start_time,
+                'endTime': end_time,
+                'limit': 1000
+            }
+            rows = upstream_flight.do(('klines-page', symbol, interval, start_time, end_time),
+                                      lambda: binance.get('/api/v3/klines', params=params, timeout=10).json())
+            columns = ohlc_columns(rows)
+    except ValueError:
+        return jsonify({'error': 'Invalid startTime or endTime'}), 400
     except requests.exceptions.RequestException as e:
         print("API request error:", e)
         traceback.print_exc()
         return jsonify({'error': 'Unable to fetch data'}), 500
 
-@app.route('/api/bitcoin-price')
+    fmt = request.args.get('format', 'rows')
+    etag = kline_etag(columns, interval, fmt)
+    if request.if_none_match.contains_weak(etag):
+        return not_modified(etag)
+
+    if fmt == 'columns':
+        # 每个字段一个数组，不必为每根 K 线重复键名
+        payload = {'interval': interval, **{k: columns[k].tolist() for k in ('x', 'o', 'h', 'l', 'c')}}
+    else:
+        payload = {'interval': interval, 'prices': [
+            {'x': x, 'o': o, 'h': h, 'l': l, 'c': c}
+            for x, o, h, l, c in zip(*(columns[k].tolist() for k in ('x', 'o', 'h', 'l', 'c')))
+        ]}
+    return compressed_json(payload, etag)
+
+def kline_etag(columns, interval, fmt):
+    """
+    已收盘的 K 线不会再变，因此由首根时间、根数和最后一根（可能未收盘）的 OHLC
+    即可确定整份数据；最后一根收盘或价格变动时 ETag 随之改变
+    """
+    if len(columns['x']) == 0:
+        key = f'{fmt}:{interval}:empty'
+    else:
+        last = [columns[k][-1] for k in ('x', 'o', 'h', 'l', 'c')]
+        key = f"{fmt}:{interval}:{columns['x'][0]}:{len(columns['x'])}:{last}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+def compressed_json(payload, etag):
+    """序列化 JSON，客户端支持时以 gzip 压缩，并附上 ETag 供之后以 304 重新验证"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    response = Response(mimetype='application/json')
+    if 'gzip' in request.accept_encodings and len(body) > 1024:
+        body = gzip.compress(body, compresslevel=5)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_data(body)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag, weak=True)
+    return response
+
+def not_modified(etag):
+    """304 回应，带上与 compressed_json 相同的 ETag 与缓存相关标头"""
+    response = Response(status=304)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.set_etag(etag, weak=True)
+    return response
+
+@main.route('/api/bitcoin-price')
 def bitcoin_price_api():
     price = get_bitcoin_price()
     return jsonify({'price': price})
 
+# SSE 连接在 gthread 下会占住一个线程，因此限制每个进程同时开放的连接数与每个连接的时长：
+# 连接到期后浏览器按 retry 自动重连；超过上限时回 503，浏览器改为每 5 秒轮询 /api/bitcoin-price
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', 4))
+SSE_STREAM_SECONDS = int(os.getenv('SSE_STREAM_SECONDS', 120))
+stream_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+# 以 Server-Sent Events 推送价格，浏览器只需保持一个连接
+@main.route('/api/bitcoin-price/stream')
+def bitcoin_price_stream():
+    if not stream_slots.acquire(blocking=False):
+        return Response('Too many price streams\n', status=503, mimetype='text/plain')
+
+    def events():
+        yield 'retry: 1000\n\n'  # 连接到期关闭后 1 秒重连
+        version = 0  # 版本 0 表示后台线程尚未取得价格
+        deadline = time.monotonic() + SSE_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            new_version, price = price_ticker.wait_for_change(version, timeout=min(15, deadline - time.monotonic()))
+            if new_version == version or price is None:
+                yield ': keep-alive\n\n'  # 防止代理因闲置而断开连接
+                continue
+            version = new_version
+            yield f"data: {json.dumps({'price': price})}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(stream_slots.release)  # 连接结束（含客户端断线）时归还名额
+    return response
+
+def create_app(config=None):
+    """创建应用；不连接数据库，MongoDB 在第一次查询时才连接"""
+    app = Flask(__name__)
+    app.secret_key = os.getenv('SECRET_KEY')  # 从环境变量中读取密钥
+    app.config['MONGODB_URI'] = os.getenv('MONGODB_URI')
+    app.config['MONGODB_DB'] = 'my_database'  # 替换成你的数据库名称
+    app.config.update(cache_config())
+    app.config.update(config or {})
+
+    login_manager.init_app(app)
+    cache.init_app(app)
+    mongo.init_app(app)
+    price_ticker.init_app(app)
+    metrics.init_app(app, 'hw3')
+    app.register_blueprint(main)
+    return app
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))  # 使用 Heroku 提供的端口
-    app.run(host='0.0.0.0', port=port)
+    create_app().run(host='0.0.0.0', port=port)
 
@@ -0,0 +1,194 @@
+"""
+Binance 上游请求客户端：共用连接池的 keep-alive Session，并对 5xx 指数退避重试。
+配置了 WeightScheduler 时每个请求先按优先级取得权重额度，429 / 418 交给调度器暂停所有请求，不再自行重试。
+"""
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limiter import CHART, PriorityPool
+
+KLINE_LIMIT = 1000  # /api/v3/klines 单次最多返回的 K 线数
+
+# 各接口的请求权重（klines 在 limit 为 1000 时为 2；ticker/price 指定 symbol 时为 2）
+ENDPOINT_WEIGHTS = {
+    '/api/v3/klines': 2,
+    '/api/v3/ticker/price': 2,
+}
+
+# 各 K 线周期的毫秒长度（'1M' 长度不固定，未列出）
+INTERVAL_MS = {
+    '1m': 60 * 1000,
+    '3m': 3 * 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '15m': 15 * 60 * 1000,
+    '30m': 30 * 60 * 1000,
+    '1h': 60 * 60 * 1000,
+    '2h': 2 * 60 * 60 * 1000,
+    '4h': 4 * 60 * 60 * 1000,
+    '6h': 6 * 60 * 60 * 1000,
+    '8h': 8 * 60 * 60 * 1000,
+    '12h': 12 * 60 * 60 * 1000,
+    '1d': 24 * 60 * 60 * 1000,
+    '3d': 3 * 24 * 60 * 60 * 1000,
+    '1w': 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def kline_windows(start_time, end_time_ms, step, limit=KLINE_LIMIT):
+    """把 [start_time, end_time_ms] 切成每段最多 limit 根 K 线的窗口"""
+    span = step * limit
+    return [
+        (lo, min(lo + span - 1, end_time_ms))
+        for lo in range(start_time, end_time_ms + 1, span)
+    ]
+
+
+class BinanceClient:
+    def __init__(self, base_url, pool_size=10, max_retries=3, backoff_factor=0.5, timeout=10, fetch_workers=4,
+                 observer=None, scheduler=None):
+        self.base_url = base_url
+        self.scheduler = scheduler  # WeightScheduler，为 None 时不限制请求权重
+        self.observer = observer  # observer(path, status, seconds)：每次请求结束（含重试）后调用
+        self.pool_size = pool_size
+        self.fetch_workers = min(fetch_workers, pool_size)  # 并行下载 K 线的线程数
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor  # 第 n 次重试前等待 backoff_factor * 2 ** (n - 1) 秒
+        self.timeout = timeout
+        self._session = None
+        self._executor = None
+        self._pid = None
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            # 有调度器时 429 须回到调度器暂停所有请求，不能由 urllib3 在单个请求内重试
+            status_forcelist=(500, 502, 503, 504) if self.scheduler else (429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'User-Agent': 'Mozilla/5.0'})
+        session.trust_env = False  # 等同于原先的 proxies={"http": None, "https": None}
+        return session
+
+    def _ensure_process(self):
+        # fork 出的子进程不能共用父进程的连接与线程，按进程重新建立
+        if self._pid != os.getpid():
+            self._session = self._build_session()
+            self._executor = PriorityPool(self.fetch_workers, name='klines')
+            self._pid = os.getpid()
+
+    @property
+    def session(self):
+        self._ensure_process()
+        return self._session
+
+    def get(self, path, params=None, timeout=None, priority=CHART):
+        """
+        GET 请求，非 2xx 或重试耗尽时抛出 requests.exceptions.RequestException。
+        priority 为 rate_limiter 中的 PRICE / CHART / BACKFILL；排队等待额度最多 timeout 秒，超时抛出 RateLimited
+        """
+        timeout = timeout or self.timeout
+        self._acquire(path, priority, timeout)
+        return self._send(path, params, timeout)
+
+    def _acquire(self, path, priority, timeout):
+        if self.scheduler:
+            self.scheduler.acquire(ENDPOINT_WEIGHTS.get(path, 1), priority, timeout=timeout)
+
+    def _send(self, path, params, timeout):
+        """发出请求；配置了调度器时，调用者须已用 _acquire 取得额度"""
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            response = self.session.get(f'{self.base_url}{path}', params=params, timeout=timeout)
+            status = response.status_code
+            if self.scheduler:
+                self.scheduler.observe(response)
+            response.raise_for_status()
+            return response
+        finally:
+            if self.observer:
+                self.observer(path, status, time.perf_counter() - started)
+
+    @staticmethod
+    def _klines_params(symbol, interval, start_time, end_time_ms):
+        return {
+            'symbol': symbol,
+            'interval': interval,
+            'startTime': start_time,
+            'endTime': end_time_ms,
+            'limit': KLINE_LIMIT
+        }
+
+    def _klines_page(self, symbol, interval, start_time, end_time_ms, priority=CHART):
+        params = self._klines_params(symbol, interval, start_time, end_time_ms)
+        return self.get('/api/v3/klines', params=params, timeout=10, priority=priority).json()
+
+    def _klines_parallel(self, symbol, interval, windows, priority):
+        """
+        各窗口先在调用者线程中按优先级取得额度（线程池的线程不会阻塞在限流上），
+        再以同一优先级排入 PriorityPool：即使回补的窗口已排满队列，之后提交的图表窗口仍会先被执行
+        """
+        self._ensure_process()
+        futures = []
+        try:
+            for lo, hi in windows:
+                self._acquire('/api/v3/klines', priority, 10)
+                params = self._klines_params(symbol, interval, lo, hi)
+                futures.append(self._executor.submit(priority, self._klines_request, params))
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _klines_request(self, params):
+        return self._send('/api/v3/klines', params, 10).json()
+
+    def klines_sequential(self, symbol, interval, start_time, end_time_ms, priority=CHART):
+        """逐页抓取，下一页的起点取决于上一页最后一根 K 线"""
+        all_data = []
+        current_start_time = start_time
+        while current_start_time <= end_time_ms:
+            data = self._klines_page(symbol, interval, current_start_time, end_time_ms, priority)
+            if not data:
+                break
+            all_data.extend(data)
+            if len(data) < KLINE_LIMIT:
+                break  # 最后一页，无需再请求一次空页
+            current_start_time = data[-1][0] + 1
+        return all_data
+
+    def klines(self, symbol, interval, start_time, end_time_ms, priority=CHART):
+        """
+        抓取 [start_time, end_time_ms] 的 K 线。固定长度的周期按 1000 根一段预先切分窗口，
+        由线程池并行下载后按顺序合并并去重；'1M' 等不定长周期退回逐页抓取。
+        任一窗口失败时抛出 requests.exceptions.RequestException；priority 决定各页向调度器排队的优先级。
+        """
+        step = INTERVAL_MS.get(interval)
+        if step is None:
+            return self.klines_sequential(symbol, interval, start_time, end_time_ms, priority)
+
+        windows = kline_windows(start_time, end_time_ms, step)
+        if len(windows) <= 1:
+            pages = [self._klines_page(symbol, interval, lo, hi, priority) for lo, hi in windows]
+        else:
+            pages = self._klines_parallel(symbol, interval, windows, priority)
+
+        all_data = []
+        last_open_time = None
+        for page in pages:
+            for row in page:
+                if last_open_time is None or row[0] > last_open_time:
+                    all_data.append(row)
+                    last_open_time = row[0]
+        return all_data
@@ -0,0 +1,141 @@
+"""以 NumPy 数组计算定期定额 (DCA)：按日索引的收盘价、买入日掩码与 cumsum"""
+import datetime
+
+import numpy as np
+
+DAY_MS = 24 * 60 * 60 * 1000
+EPOCH = datetime.date(1970, 1, 1)
+INTERVALS = ('daily', 'weekly', 'monthly')
+RESOLUTIONS = ('daily', 'weekly', 'monthly')  # 结果图表的取样粒度
+
+
+def day_number(date):
+    """日期 -> 自 1970-01-01 起的天数"""
+    return (date - EPOCH).days
+
+
+def price_array(klines, first_day, last_day):
+    """把日 K 线的收盘价放进 [first_day, last_day] 的数组，缺失日为 NaN"""
+    closes = np.full(last_day - first_day + 1, np.nan)
+    if not klines:
+        return closes
+    rows = np.asarray([(k[0], k[4]) for k in klines], dtype=float)
+    days = (rows[:, 0] // DAY_MS).astype(np.int64) - first_day
+    inside = (days >= 0) & (days < len(closes))
+    closes[days[inside]] = rows[inside, 1]
+    return closes
+
+
+def buy_days(start_day, end_day, interval):
+    """返回 [start_day, end_day] 内的买入日（天数），规则与原逐日循环一致"""
+    if end_day < start_day:
+        return np.empty(0, dtype=np.int64)
+    if interval == 'daily':
+        return np.arange(start_day, end_day + 1, dtype=np.int64)
+    if interval == 'weekly':
+        return np.arange(start_day, end_day + 1, 7, dtype=np.int64)
+    if interval == 'monthly':
+        start = np.datetime64(int(start_day), 'D')
+        n_months = (end_day - start_day) // 28 + 2
+        months = start.astype('datetime64[M]') + np.arange(1, n_months)
+        dom = min((EPOCH + datetime.timedelta(days=int(start_day))).day, 28)  # 之后每月固定在第 min(day, 28) 天
+        later = (months.astype('datetime64[D]') + (dom - 1)).astype(np.int64)
+        days = np.concatenate(([start_day], later))
+        return days[days <= end_day]
+    raise ValueError(f"Invalid interval: {interval}")
+
+
+def buy_mask(start_days, end_day, interval, first_day, n_days):
+    """返回形状 (len(start_days), n_days) 的布尔掩码，以及每个起始日的买入次数"""
+    mask = np.zeros((len(start_days), n_days), dtype=bool)
+    counts = np.zeros(len(start_days), dtype=np.int64)
+    for row, start_day in enumerate(start_days):
+        days = buy_days(start_day, end_day, interval)
+        counts[row] = len(days)
+        idx = days - first_day
+        mask[row, idx[(idx >= 0) & (idx < n_days)]] = True
+    return mask, counts
+
+
+def run_dca(klines, start_date, end_date, interval, amount, today):
+    """
+    单组参数的 DCA。返回 (total_invested, total_btc, dates, values, invested)，
+    dates/values/invested 为 start_date 至 today 每个有收盘价的日子的持仓市值与累计投入。
+    """
+    first_day, last_day = day_number(start_date), day_number(today)
+    end_day = min(day_number(end_date), last_day)
+    closes = price_array(klines, first_day, last_day)
+    mask, counts = buy_mask([first_day], end_day, interval, first_day, len(closes))
+
+    priced = ~np.isnan(closes)
+    btc_bought = np.where(mask[0] & priced, amount / np.where(priced, closes, 1.0), 0.0)
+    btc_held = np.cumsum(btc_bought)
+
+    idx = np.flatnonzero(priced)
+    dates = np.datetime_as_string(np.datetime64(first_day, 'D') + idx, unit='D').tolist()
+    values = np.round(btc_held[idx] * closes[idx], 2).tolist()
+    invested = (np.cumsum(mask[0])[idx] * amount).tolist()
+    return amount * int(counts[0]), float(btc_held[-1]) if len(btc_held) else 0.0, dates, values, invested
+
+
+def add_today(history, start_date, end_date, interval, amount, today, price):
+    """
+    把今日接在只含已收盘日 K 线的 run_dca 结果之后：今日是买入日时以即时价格 price 买入，
+    并以 price 计算今日的持仓市值。price 无效（<= 0）时原样返回 history。
+    """
+    total_invested, total_btc, dates, values, invested = history
+    if not price or price <= 0 or start_date > today:
+        return history
+    today_day = day_number(today)
+    days = buy_days(day_number(start_date), min(day_number(end_date), today_day), interval)
+    if len(days) and days[-1] == today_day:
+        total_invested += amount
+        total_btc += amount / price
+    return (total_invested, total_btc, dates + [today.isoformat()], values + [round(total_btc * price, 2)],
+            invested + [total_invested])
+
+
+def series_indices(dates, resolution='daily', points=None):
+    """
+    选出图表要用的点：weekly / monthly 取每周（周一起算）/ 每月最后一个有价格的日子，
+    points 再把结果均匀抽样到不超过 points 个，首尾两点总会保留。
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    idx = np.arange(len(days))
+    if resolution == 'weekly':
+        period = (days.astype(np.int64) + 3) // 7  # 1970-01-01 是星期四
+    elif resolution == 'monthly':
+        period = days.astype('datetime64[M]').astype(np.int64)
+    else:
+        period = None
+    if period is not None and len(idx):
+        idx = idx[np.append(period[1:] != period[:-1], True)]
+    if points and len(idx) > points:
+        idx = idx[np.unique(np.linspace(0, len(idx) - 1, points).round().astype(np.int64))]
+    return idx
+
+
+def sweep_dca(klines, start_dates, end_date, intervals, amounts, today):
+    """
+    批量计算多组 (起始日, 周期, 金额)。返回 dict，其中 total_invested 与 total_btc
+    的形状为 (len(start_dates), len(intervals), len(amounts))。
+    """
+    start_days = np.asarray([day_number(d) for d in start_dates], dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    first_day, last_day = int(start_days.min()), day_number(today)
+    end_day = min(day_number(end_date), last_day)
+    closes = price_array(klines, first_day, last_day)
+    inverse = np.where(np.isnan(closes), 0.0, 1.0 / np.where(np.isnan(closes), 1.0, closes))
+
+    # 每 1 美元可买到的 BTC 数量，与金额线性相关，最后再与 amounts 广播相乘
+    btc_per_usd = np.zeros((len(start_days), len(intervals)))
+    buy_counts = np.zeros((len(start_days), len(intervals)), dtype=np.int64)
+    for col, interval in enumerate(intervals):
+        mask, counts = buy_mask(start_days, end_day, interval, first_day, len(closes))
+        btc_per_usd[:, col] = mask @ inverse
+        buy_counts[:, col] = counts
+
+    return {
+        'total_invested': buy_counts[:, :, None] * amounts[None, None, :],
+        'total_btc': btc_per_usd[:, :, None] * amounts[None, None, :],
+    }
@@ -0,0 +1,47 @@
+"""K 线降采样：把相邻的 K 线合并成固定数量的 OHLC 桶，保留每段的开高低收"""
+import numpy as np
+
+from binance_client import INTERVAL_MS
+
+# 由细到粗的候选周期
+INTERVAL_LADDER = ['1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d', '1w']
+OVERSAMPLE = 4  # 基础周期最多抓取 points * OVERSAMPLE 根 K 线，再合并到 points 根
+
+
+def choose_interval(start_time, end_time_ms, points):
+    """选择能让 [start_time, end_time_ms] 不超过 points * OVERSAMPLE 根 K 线的最细周期"""
+    span = max(end_time_ms - start_time, 0)
+    for interval in INTERVAL_LADDER:
+        if span // INTERVAL_MS[interval] + 1 <= points * OVERSAMPLE:
+            return interval
+    return INTERVAL_LADDER[-1]
+
+
+def ohlc_columns(rows):
+    """Binance 原始 K 线 -> 各字段一个数组 (x, o, h, l, c)"""
+    if not rows:
+        return {'x': np.empty(0, dtype=np.int64), 'o': np.empty(0), 'h': np.empty(0), 'l': np.empty(0), 'c': np.empty(0)}
+    arr = np.asarray([row[1:5] for row in rows], dtype=float)
+    return {
+        'x': np.asarray([row[0] for row in rows], dtype=np.int64),
+        'o': arr[:, 0],
+        'h': arr[:, 1],
+        'l': arr[:, 2],
+        'c': arr[:, 3],
+    }
+
+
+def merge_ohlc(columns, points):
+    """把 K 线平均分成 points 个桶：开盘取首根，收盘取末根，高低取极值"""
+    n = len(columns['x'])
+    if n <= points:
+        return columns
+    edges = np.linspace(0, n, points + 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:] - 1
+    return {
+        'x': columns['x'][starts],
+        'o': columns['o'][starts],
+        'h': np.maximum.reduceat(columns['h'], starts),
+        'l': np.minimum.reduceat(columns['l'], starts),
+        'c': columns['c'][ends],
+    }
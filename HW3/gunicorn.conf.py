@@ -0,0 +1,57 @@
+"""
+HW3 的 gunicorn 配置，Procfile 中以 `gunicorn --config HW3/gunicorn.conf.py wsgi:app` 启动。
+
+容量估算：
+  本应用的请求大多在等待 Binance 与 MongoDB，CPU 时间只占一小部分，因此使用 gthread
+  worker：进程数随 CPU 核数增加，每个进程再用多个线程覆盖阻塞等待。
+  - WEB_CONCURRENCY（进程数）默认 2 * 核数 + 1；Heroku 会按 dyno 内存自动设置此变量。
+  - GUNICORN_THREADS（每进程线程数）≈ 1 + 等待时间 / CPU 时间。例如一次 K 线请求
+    等待上游 400ms、自身计算 50ms，则约 9 个线程可让一个核保持忙碌；默认取 8。
+  - 每个 /api/bitcoin-price/stream（SSE）连接会占住一个线程。每个进程最多开放 SSE_MAX_STREAMS 个
+    （默认为线程数的一半），每个连接最长 SSE_STREAM_SECONDS 秒后由浏览器重连；
+    名额用尽时浏览器改为每 5 秒轮询，普通请求至少保留一半线程。
+  - 每个进程有各自的 Binance 连接池（BINANCE_POOL_SIZE），线程数超过它时多出的线程会排队等待连接。
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+chdir = os.path.dirname(os.path.abspath(__file__))  # 让 `from app import ...` 等同级导入可用
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+os.environ.setdefault('SSE_MAX_STREAMS', str(max(1, threads // 2)))  # 须在导入应用前设置
+
+# 先在 master 中导入应用再 fork，节省内存并让启动错误在 master 中就暴露；
+# create_app 不连接 MongoDB，各 worker 在第一次查询时建立自己的连接
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))  # worker 无响应超过此秒数即被重启
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))  # 重启 / 关闭时等待进行中请求的秒数
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))  # 负载均衡器后的 keep-alive 秒数
+
+# 定期重启 worker，避免长时间运行后内存增长
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = 100
+
+accesslog = '-'
+errorlog = '-'
+
+# 各 worker 的 Prometheus 指标写入此目录，/metrics 汇总所有 worker；须在导入应用前设置
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'hw3-metrics'))
+
+
+def on_starting(server):
+    """清除上次运行留下的指标文件"""
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
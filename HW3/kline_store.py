@@ -0,0 +1,107 @@
+"""K 线本地存储：按 (symbol, interval) 持久化 Binance K 线，并只补抓缺失的时间段"""
+import time
+
+from pymongo import ASCENDING, UpdateOne
+
+from binance_client import INTERVAL_MS
+
+# 开盘时间与 epoch 对齐的周期才做持久化（'3d'、'1w' 的对齐方式不同）
+STORED_INTERVALS = {k for k in INTERVAL_MS if INTERVAL_MS[k] <= INTERVAL_MS['1d']}
+
+
+def merge_ranges(ranges, step):
+    """合并重叠或相邻（相差一个周期）的 [lo, hi] 区间"""
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+
+def missing_ranges(covered, lo, hi, step):
+    """返回 [lo, hi] 中未被 covered 覆盖的区间（均以 K 线开盘时间表示）"""
+    gaps = []
+    cursor = lo
+    for c_lo, c_hi in covered:
+        if c_hi < cursor:
+            continue
+        if c_lo > hi:
+            break
+        if c_lo > cursor:
+            gaps.append([cursor, c_lo - step])
+        cursor = max(cursor, c_hi + step)
+        if cursor > hi:
+            break
+    if cursor <= hi:
+        gaps.append([cursor, hi])
+    return gaps
+
+
+class KlineStore:
+    """以 MongoDB 集合保存 K 线，另用一个集合记录已完整保存的时间区间"""
+
+    def __init__(self, db, candles_name='klines', coverage_name='kline_coverage'):
+        self.candles = db[candles_name]
+        self.coverage = db[coverage_name]
+
+    def ensure_indexes(self):
+        self.candles.create_index(
+            [('symbol', ASCENDING), ('interval', ASCENDING), ('open_time', ASCENDING)],
+            unique=True
+        )
+
+    def _covered(self, symbol, interval):
+        doc = self.coverage.find_one({'_id': f'{symbol}:{interval}'})
+        return doc['ranges'] if doc else []
+
+    def _mark_covered(self, symbol, interval, lo, hi):
+        step = INTERVAL_MS[interval]
+        ranges = merge_ranges(self._covered(symbol, interval) + [[lo, hi]], step)
+        self.coverage.update_one(
+            {'_id': f'{symbol}:{interval}'},
+            {'$set': {'ranges': ranges}},
+            upsert=True
+        )
+
+    def _save(self, symbol, interval, rows):
+        if not rows:
+            return
+        ops = [
+            UpdateOne(
+                {'symbol': symbol, 'interval': interval, 'open_time': row[0]},
+                {'$set': {'row': row}},
+                upsert=True
+            )
+            for row in rows
+        ]
+        self.candles.bulk_write(ops, ordered=False)
+
+    def get(self, symbol, interval, start_time, end_time_ms, fetch):
+        """
+        返回开盘时间落在 [start_time, end_time_ms] 内的 K 线（Binance 原始格式）。
+        只对未覆盖的区间调用 fetch(symbol, interval, start, end)；
+        未收盘的 K 线每次都会重新抓取，不计入已覆盖区间；fetch 抛出的异常直接向上传递。
+        """
+        if interval not in STORED_INTERVALS:
+            return fetch(symbol, interval, start_time, end_time_ms)
+
+        step = INTERVAL_MS[interval]
+        lo = -(-start_time // step) * step
+        hi = end_time_ms // step * step
+        if lo > hi:
+            return []
+
+        last_closed = (int(time.time() * 1000) // step - 1) * step
+        for gap_lo, gap_hi in missing_ranges(self._covered(symbol, interval), lo, hi, step):
+            rows = fetch(symbol, interval, gap_lo, gap_hi)
+            self._save(symbol, interval, rows)
+            if min(gap_hi, last_closed) >= gap_lo:
+                self._mark_covered(symbol, interval, gap_lo, min(gap_hi, last_closed))
+
+        cursor = self.candles.find(
+            {'symbol': symbol, 'interval': interval, 'open_time': {'$gte': lo, '$lte': hi}},
+            {'_id': 0, 'row': 1}
+        ).sort('open_time', ASCENDING)
+        return [doc['row'] for doc in cursor]
@@ -0,0 +1,88 @@
+"""
+MongoDB 延迟连接：第一次访问集合时才创建 MongoClient，导入模块、创建应用与 fork 都不会连接数据库。
+每个进程创建连接时顺带建立所需索引（create_index 可重复执行），不依赖部署时另外执行命令。
+"""
+import os
+import threading
+
+from pymongo import MongoClient, ASCENDING, monitoring
+
+from kline_store import KlineStore
+
+
+class CommandTimer(monitoring.CommandListener):
+    """pymongo 命令监听器：每个命令结束时调用 observer(command_name, 'ok' | 'error', seconds)"""
+
+    def __init__(self, observer):
+        self.observer = observer
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.observer(event.command_name, 'ok', event.duration_micros / 1e6)
+
+    def failed(self, event):
+        self.observer(event.command_name, 'error', event.duration_micros / 1e6)
+
+
+class Mongo:
+    def __init__(self, event_listeners=()):
+        self.event_listeners = list(event_listeners)
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self.uri = None
+        self.db_name = None
+        self.auto_index = True
+
+    def init_app(self, app):
+        self.uri = app.config.get('MONGODB_URI')
+        self.db_name = app.config.get('MONGODB_DB', 'my_database')
+        self.auto_index = app.config.get('MONGODB_ENSURE_INDEXES', True)  # 基准测试批量写入测试数据前可关闭
+        app.extensions['mongo'] = self
+
+    @property
+    def client(self):
+        """当前进程的 MongoClient；fork 出的子进程会建立自己的连接，第一次连接时建立索引"""
+        with self._lock:
+            if self._client is None or self._pid != os.getpid():
+                client = MongoClient(self.uri, event_listeners=self.event_listeners)
+                if self.auto_index:
+                    self._create_indexes(client[self.db_name])  # 失败时不保存连接，下次访问再试
+                self._client = client
+                self._pid = os.getpid()
+            return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    @property
+    def users(self):
+        return self.db['users']  # 用户数据的集合
+
+    @property
+    def logs(self):
+        return self.db['startup_log']  # 日志数据的集合
+
+    @property
+    def kline_store(self):
+        return KlineStore(self.db)  # K 线本地存储（klines / kline_coverage 集合）
+
+    def ensure_indexes(self):
+        """建立本应用查询所需的索引；create_index 对已存在的索引不做任何事，可重复执行"""
+        self._create_indexes(self.db)
+
+    @staticmethod
+    def _create_indexes(db):
+        db['users'].create_index([('username', ASCENDING)])
+        # 按用户列出日志并以 _id 分页
+        db['startup_log'].create_index([('user_id', ASCENDING), ('_id', ASCENDING)])
+        KlineStore(db).ensure_indexes()
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
@@ -0,0 +1,77 @@
+"""后台价格轮询：每个进程只有一个线程向 Binance 取价，其余请求与 SSE 连接共享结果"""
+import os
+import threading
+import time
+
+
+class PriceTicker:
+    def __init__(self, fetch, interval=2.0, idle_timeout=60.0):
+        self._fetch = fetch  # 取价函数，失败时抛出异常
+        self.interval = interval
+        self.idle_timeout = idle_timeout  # 无人使用超过此秒数后停止轮询
+        self.app = None
+        self._cond = threading.Condition()
+        self._price = None
+        self._updated = 0.0
+        self._version = 0
+        self._last_demand = 0.0
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        """轮询线程在此应用的应用上下文中执行，fetch 才能使用缓存等扩展"""
+        self.app = app
+
+    def start(self):
+        """确保当前进程的轮询线程在运行（fork 后的子进程会重新启动自己的线程）"""
+        with self._cond:
+            self._last_demand = time.time()
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='price-ticker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        if self.app is None:
+            self._poll()
+            return
+        # 线程自己推入应用上下文，不沿用启动它的请求的上下文
+        with self.app.app_context():
+            self._poll()
+
+    def _poll(self):
+        while True:
+            with self._cond:
+                if time.time() - self._last_demand > self.idle_timeout:
+                    self._thread = None
+                    return
+            try:
+                price = self._fetch()
+            except Exception as e:
+                print(f"Price ticker failed to refresh: {e}")
+            else:
+                with self._cond:
+                    if price != self._price:
+                        self._version += 1
+                    self._price = price
+                    self._updated = time.time()
+                    self._cond.notify_all()
+            time.sleep(self.interval)
+
+    def latest(self, max_age=None):
+        """返回最近一次取得的价格；超过 max_age 秒未更新则返回 None"""
+        self.start()
+        with self._cond:
+            if self._price is None:
+                return None
+            if max_age is not None and time.time() - self._updated > max_age:
+                return None
+            return self._price
+
+    def wait_for_change(self, version, timeout):
+        """阻塞至价格版本不同于 version 或超时，返回 (version, price)"""
+        self.start()
+        with self._cond:
+            self._cond.wait_for(lambda: self._version != version, timeout)
+            return self._version, self._price
@@ -0,0 +1,134 @@
+"""
+Binance 请求权重调度：令牌桶按每分钟权重上限匀速补充，并以响应头 x-mbx-used-weight-1m 校准。
+该响应头是 Binance 按 IP 统计的已用权重，同一主机上所有 worker 的用量都会反映进来。
+
+令牌不足时请求按优先级排队（实时价格 > 图表 > 回补历史数据），且低优先级请求取令牌后
+桶内仍须留有保留额度，大量回补历史数据不会耗尽额度而让价格请求遇到 429 / 418。
+收到 429 / 418 时按 Retry-After 暂停所有请求。
+PriorityPool 是按同样优先级取任务的线程池，供并行下载 K 线窗口使用。
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+PRICE, CHART, BACKFILL = 0, 1, 2
+PRIORITY_NAMES = {PRICE: 'price', CHART: 'chart', BACKFILL: 'backfill'}
+# 各优先级取令牌后桶内至少要剩下的额度比例：图表不动用最后 10%，回补历史数据不动用最后 30%
+RESERVE = {PRICE: 0.0, CHART: 0.1, BACKFILL: 0.3}
+DEFAULT_PAUSE = 60  # 429 / 418 未带 Retry-After 时暂停的秒数
+
+
+class RateLimited(requests.exceptions.RequestException):
+    """在等待期限内取不到权重额度（或 Binance 要求暂停）"""
+
+
+class WeightScheduler:
+    def __init__(self, weight_limit=6000, window=60, observer=None):
+        self.capacity = weight_limit
+        self.rate = weight_limit / window  # 每秒补充的权重
+        self.observer = observer  # observer(priority_name, waited_seconds)：每次取得额度后调用
+        self._tokens = float(weight_limit)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []  # (priority, seq) 小顶堆，堆顶是下一个可取令牌的请求
+        self._seq = itertools.count()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_time(self, weight, priority, now):
+        """还需等待多少秒才能取得 weight 个令牌，0 表示现在即可"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        shortfall = weight + RESERVE[priority] * self.capacity - self._tokens
+        return max(0.0, shortfall / self.rate)
+
+    def acquire(self, weight, priority=CHART, timeout=None):
+        """
+        取得 weight 个令牌，令牌不足或前面有更高优先级的请求时排队等待；
+        timeout 秒内仍取不到时抛出 RateLimited
+        """
+        started = time.monotonic()
+        deadline = None if timeout is None else started + timeout
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(weight, priority, now)
+                    if self._waiting[0] == entry and wait == 0:
+                        self._tokens -= weight
+                        break
+                    if deadline is not None and now >= deadline:
+                        raise RateLimited(f'Binance request weight unavailable after {timeout}s')
+                    # 非堆顶的请求等堆顶离开时被唤醒
+                    if self._waiting[0] != entry:
+                        wait = None
+                    if deadline is not None:
+                        wait = deadline - now if wait is None else min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+        if self.observer:
+            self.observer(PRIORITY_NAMES[priority], time.monotonic() - started)
+
+    def observe(self, response):
+        """以 Binance 回报的已用权重校准令牌数；429 / 418 时按 Retry-After 暂停"""
+        used = response.headers.get('x-mbx-used-weight-1m')
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if used is not None and used.isdigit():
+                self._tokens = min(self._tokens, self.capacity - int(used))
+            if response.status_code in (418, 429):
+                retry_after = response.headers.get('Retry-After', '')
+                pause = int(retry_after) if retry_after.isdigit() else DEFAULT_PAUSE
+                self._paused_until = max(self._paused_until, now + pause)
+            self._cond.notify_all()
+
+
+class PriorityPool:
+    """固定数量的工作线程，按 (优先级, 提交顺序) 取出任务：先提交的大量回补窗口不会挡住之后提交的图表窗口"""
+
+    def __init__(self, max_workers, name='pool'):
+        self.max_workers = max_workers
+        self.name = name
+        self._cond = threading.Condition()
+        self._queue = []  # (priority, seq, future, fn, args) 小顶堆
+        self._seq = itertools.count()
+        self._threads = []
+
+    def submit(self, priority, fn, *args):
+        """排入 fn(*args)，返回 concurrent.futures.Future"""
+        future = Future()
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), future, fn, args))
+            if len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, name=f'{self.name}-{len(self._threads)}', daemon=True)
+                self._threads.append(thread)
+                thread.start()
+            self._cond.notify()
+        return future
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, future, fn, args = heapq.heappop(self._queue)
+            if not future.set_running_or_notify_cancel():
+                continue  # 已被取消
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
@@ -34,9 +34,93 @@ document.addEventListener("DOMContentLoaded", () => {
                 .catch(error => console.error("Unable to fetch Bitcoin price", error));
         };
 
-        // 初次获取价格并设置定时器
-        fetchBitcoinPrice();
-        setInterval(fetchBitcoinPrice, 5000); // 每5秒更新价格
+        const startPolling = () => {
+            fetchBitcoinPrice();
+            setInterval(fetchBitcoinPrice, 5000); // 每5秒更新价格
+        };
+
+        if (window.EventSource) {
+            // 通过 SSE 接收服务器推送的价格；服务器定期结束连接，浏览器会按 retry 自动重连
+            const priceStream = new EventSource('/api/bitcoin-price/stream');
+            priceStream.onmessage = (event) => {
+                const newPrice = parseFloat(JSON.parse(event.data).price);
+                if (!isNaN(newPrice)) {
+                    updatePrice(newPrice);
+                }
+            };
+            priceStream.onerror = (error) => {
+                // 服务器连接数已满（503）时浏览器不会再重连，改为轮询
+                if (priceStream.readyState === EventSource.CLOSED) {
+                    console.error("Bitcoin price stream unavailable, falling back to polling", error);
+                    startPolling();
+                }
+            };
+        } else {
+            // 不支持 EventSource 的浏览器退回轮询
+            startPolling();
+        }
+    }
+
+    // 日志列表滚动到底部时加载下一页
+    const logList = document.getElementById('log-list');
+    const logListMore = document.getElementById('log-list-more');
+    if (logList && logListMore && window.IntersectionObserver) {
+        let loadingLogs = false;
+
+        const renderLog = (log) => {
+            const item = document.createElement('div');
+            item.className = 'list-group-item cyberpunk-log-item';
+            const title = document.createElement('h5');
+            title.textContent = log.name;
+            const description = document.createElement('p');
+            description.textContent = log.description;
+            const detail = document.createElement('a');
+            detail.href = log.detail_url;
+            detail.className = 'btn btn-info btn-sm';
+            detail.textContent = 'Details';
+            item.append(title, description, detail);
+
+            if (log.edit_url) {
+                const edit = document.createElement('a');
+                edit.href = log.edit_url;
+                edit.className = 'btn btn-warning btn-sm';
+                edit.textContent = 'Edit';
+                const form = document.createElement('form');
+                form.action = log.delete_url;
+                form.method = 'POST';
+                form.style.display = 'inline';
+                const button = document.createElement('button');
+                button.type = 'submit';
+                button.className = 'btn btn-danger btn-sm';
+                button.textContent = 'Delete';
+                button.onclick = () => confirm('Are you sure you want to delete this log?');
+                form.append(button);
+                item.append(' ', edit, ' ', form);
+            }
+            return item;
+        };
+
+        const observer = new IntersectionObserver((entries) => {
+            if (!entries[0].isIntersecting || loadingLogs) return;
+            loadingLogs = true;
+            fetch(`/api/logs?after=${encodeURIComponent(logListMore.dataset.nextCursor)}&mine=${logListMore.dataset.mine}`)
+                .then(response => response.json())
+                .then(data => {
+                    (data.logs || []).forEach(log => logList.append(renderLog(log)));
+                    if (data.next_cursor) {
+                        logListMore.dataset.nextCursor = data.next_cursor;
+                        // 重新观察，若提示仍在视窗内会立即加载下一页
+                        observer.unobserve(logListMore);
+                        observer.observe(logListMore);
+                    } else {
+                        observer.disconnect();
+                        logListMore.remove();
+                    }
+                })
+                .catch(error => console.error("Unable to load more logs", error))
+                .finally(() => { loadingLogs = false; });
+        });
+        observer.observe(logListMore);
     }
 
     // 初始化 K 线图，仅在相关元素存在时执行
@@ -86,19 +170,15 @@ document.addEventListener("DOMContentLoaded", () => {
             }
         });
 
+        // 图表的点数上限，由服务器选择 K 线周期并合并到此数量
+        const chartPoints = Math.min(Math.max(Math.round(klineChartElement.clientWidth / 2), 200), 1000);
+        const chartCache = {};
+
         // 获取并更新图表数据的函数
         function fetchData(range, startDate = null, endDate = null) {
-            const intervalMapping = {
-                '1d': '3m',
-                '7d': '15m',
-                '1mo': '1h',
-                '1y': '12h',
-                '3y': '3d',
-                '10y': '1w'
-            };
-            let interval = intervalMapping[range] || '3m';
             let startTime;
-            let endTime = Date.now();
+            // 取整到分钟：同一分钟内打开同一预设范围的请求完全相同，服务器可合并并以 304 回应
+            let endTime = Math.floor(Date.now() / 60000) * 60000;
 
             if (range === 'custom') {
                 if (!startDate || !endDate) {
@@ -107,7 +187,6 @@ document.addEventListener("DOMContentLoaded", () => {
                 }
                 startTime = startDate.getTime();
                 endTime = endDate.getTime();
-                interval = determineInterval(startTime, endTime);
             } else {
                 const dayMs = 24 * 60 * 60 * 1000;
                 const rangeMs = {
@@ -123,16 +202,25 @@ document.addEventListener("DOMContentLoaded", () => {
 
             if (loadingElement) loadingElement.style.display = 'block';
 
+            // 同一范围再次请求时带上 ETag，数据未变时服务器只回 304
+            const cacheKey = range === 'custom' ? `custom:${startTime}:${endTime}` : range;
+            const cached = chartCache[cacheKey];
+
             $.ajax({
                 url: '/api/bitcoin-historical-data',
-                data: { interval: interval, startTime: startTime, endTime: endTime },
-                success: function(data) {
-                    if (data.error) {
+                data: { points: chartPoints, startTime: startTime, endTime: endTime, format: 'columns' },
+                headers: cached ? { 'If-None-Match': cached.etag } : {},
+                success: function(data, textStatus, jqXHR) {
+                    if (jqXHR.status === 304 && cached) {
+                        data = cached.data;
+                    } else if (data.error) {
                         alert("Error fetching data: " + data.error);
                         if (loadingElement) loadingElement.style.display = 'none';
                         return;
+                    } else if (jqXHR.getResponseHeader('ETag')) {
+                        chartCache[cacheKey] = { etag: jqXHR.getResponseHeader('ETag'), data: data };
                     }
-                    updateChart(data.prices);
+                    updateChart(data.x.map((x, i) => ({ x: x, o: data.o[i], h: data.h[i], l: data.l[i], c: data.c[i] })));
                     if (loadingElement) loadingElement.style.display = 'none';
                 },
                 error: function(error) {
@@ -178,16 +266,6 @@ document.addEventListener("DOMContentLoaded", () => {
             klineChart.update();
         }
 
-        // 确定合适的时间间隔
-        function determineInterval(startTime, endTime) {
-            const diff = endTime - startTime;
-            const day = 24 * 60 * 60 * 1000;
-            if (diff <= 7 * day) return '15m';
-            else if (diff <= 30 * day) return '1h';
-            else if (diff <= 365 * day) return '12h';
-            else return '1d';
-        }
-
         // 为范围按钮添加点击事件
         if (rangeButtons && customRangePicker && fetchCustomDataButton) {
             rangeButtons.forEach(button => {
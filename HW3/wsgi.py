@@ -0,0 +1,4 @@
+"""WSGI 入口：gunicorn wsgi:app（配置见 gunicorn.conf.py）"""
+from app import create_app
+
+app = create_app()
@@ -0,0 +1,64 @@
+"""
+HW2 基准测试：join 视图与 dashboard 的延迟分位数与吞吐量。
+默认使用内存中的 MySQL 替身（只测应用与模板的开销）；--mysql local 则连接 db.py 中配置的 MySQL。
+
+    python bench/bench_hw2.py --output hw2.json
+"""
+import argparse
+import json
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'HW2'))
+
+from loadgen import run_load, serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the HW2 join view offline.')
+    parser.add_argument('--mysql', choices=('mock', 'local'), default='mock')
+    parser.add_argument('--user-id', type=int, default=1, help='Logged-in user for the benchmarked pages')
+    parser.add_argument('--db-latency', type=float, default=0.001, help='Seconds added to each mock query')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route and concurrency level')
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    import db
+    if args.mysql == 'mock':
+        from mocks import FakeMySQLData, FakeMySQLPool
+        db.pooling.MySQLConnectionPool = FakeMySQLPool(FakeMySQLData(), latency=args.db_latency)
+    import app as hw2
+
+    app = hw2.app
+    # 直接签发登录后的 session cookie，不经过登录页的密码哈希
+    cookie = app.session_interface.get_signing_serializer(app).dumps(
+        {'user_id': args.user_id, 'username': f'user{args.user_id}', 'user_email': f'user{args.user_id}@example.com'}
+    )
+
+    def login(session):
+        session.cookies.set(app.config['SESSION_COOKIE_NAME'], cookie)
+
+    server, base = serve(app)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    pages = {'join': '/join', 'dashboard': '/dashboard'}
+    results = {'target': 'hw2', 'routes': {}}
+    for name, path in pages.items():
+        def send(session, url=base + path):
+            return session.get(url, allow_redirects=False)
+        results['routes'][name] = [run_load(send, level, args.requests, session_setup=login) for level in levels]
+        print(f'hw2 {name}: done', file=sys.stderr)
+    results['pool'] = db.pool_stats()
+    server.shutdown()
+
+    output = json.dumps(results, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+HW3 基准测试：本地 Binance 替身 + mongomock（或 --mongo-uri 指定的本地 MongoDB），
+测量热点路由的延迟分位数与吞吐量，以及 run_dca 在 1 / 5 / 10 年区间的计算耗时。
+
+    python bench/bench_hw3.py --output hw3.json
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), 'HW3'))
+
+from dca_engine import run_dca  # noqa: E402
+from downsample import choose_interval  # noqa: E402
+from fake_binance import FIRST_OPEN_TIME, FakeBinance  # noqa: E402
+from loadgen import microbenchmark, run_load, serve  # noqa: E402
+
+DCA_YEARS = (1, 5, 10)
+CHART_POINTS = 500
+
+
+def day_ms(day):
+    return int(datetime.datetime.combine(day, datetime.time()).timestamp() * 1000)
+
+
+def chart_range(today):
+    """K 线图测的是最近一年"""
+    return day_ms(today - datetime.timedelta(days=365)), day_ms(today)
+
+
+def routes(today):
+    start_ms, end_ms = chart_range(today)
+    chart = f'/api/bitcoin-historical-data?startTime={start_ms}&endTime={end_ms}&points={CHART_POINTS}&format=columns'
+    dca_form = {'date_range': f'{today.replace(year=today.year - 5)} to {today}', 'interval': 'weekly', 'amount': '100'}
+    return {
+        'index': lambda base: lambda s: s.get(base + '/'),
+        'bitcoin_price': lambda base: lambda s: s.get(base + '/api/bitcoin-price'),
+        'historical_data': lambda base: lambda s: s.get(base + chart),
+        'dca': lambda base: lambda s: s.post(base + '/dca', data=dca_form),
+    }
+
+
+def seed_logs(mongo, count):
+    if mongo.logs.estimated_document_count() >= count:
+        return
+    mongo.logs.insert_many([
+        {'name': f'Log {i}', 'description': 'Benchmark log entry. ' * 20, 'user_id': f'user{i % 10}'}
+        for i in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark HW3 hot paths offline.')
+    parser.add_argument('--mongo-uri', default='mock', help="'mock' for mongomock, or a local MongoDB URI")
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route and concurrency level')
+    parser.add_argument('--upstream-latency', type=float, default=0.05, help='Seconds added to each fake Binance response')
+    parser.add_argument('--dca-repeat', type=int, default=20)
+    parser.add_argument('--output', help='Write JSON results here instead of stdout')
+    args = parser.parse_args()
+
+    fake = FakeBinance(latency=args.upstream_latency).start()
+    os.environ['BINANCE_BASE_URL'] = fake.url
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix='hw3-bench-cache-')
+
+    import app as hw3
+    today = datetime.date.today()
+    if args.mongo_uri == 'mock':
+        from mocks import seed_kline_store, use_mongomock
+        use_mongomock()
+        config = {'MONGODB_DB': 'bench', 'MONGODB_ENSURE_INDEXES': False}  # 写入测试数据后再建索引
+    else:
+        config = {'MONGODB_URI': args.mongo_uri, 'MONGODB_DB': 'bench'}
+    app = hw3.create_app(config)
+    seed_logs(hw3.mongo, 500)
+    if args.mongo_uri == 'mock':
+        # 在建立唯一索引之前写入：mongomock 对每笔插入逐一检查唯一索引
+        store = hw3.mongo.kline_store
+        seed_kline_store(store, fake, 'BTCUSDT', '1d', FIRST_OPEN_TIME, day_ms(today))
+        start_ms, end_ms = chart_range(today)
+        seed_kline_store(store, fake, 'BTCUSDT', choose_interval(start_ms, end_ms, CHART_POINTS), start_ms, end_ms)
+    hw3.mongo.ensure_indexes()
+
+    server, base = serve(app)
+    results = {'target': 'hw3', 'routes': {}, 'run_dca': {}}
+    levels = [int(level) for level in args.concurrency.split(',')]
+    for name, make_send in routes(today).items():
+        send = make_send(base)
+        results['routes'][name] = [run_load(send, level, args.requests) for level in levels]
+        print(f'hw3 {name}: done', file=sys.stderr)
+
+    # calculate_dca 的历史部分由 dca_history 缓存，重复调用只会测到缓存命中；
+    # 这里先取出 K 线，直接测 run_dca 本身的计算
+    with app.test_request_context():
+        for years in DCA_YEARS:
+            start = today.replace(year=today.year - years)
+            klines = hw3.get_historical_data('BTCUSDT', '1d', day_ms(start), day_ms(today))
+            results['run_dca'][f'{years}y'] = microbenchmark(
+                lambda: run_dca(klines, start, today, 'daily', 100.0, today), repeat=args.dca_repeat
+            )
+
+    results['upstream_requests'] = dict(fake.requests)
+    results['kline_sources'] = dict(fake.kline_sources)
+    results['single_flight'] = {
+        name: {'executed': flight.executed, 'shared': flight.shared}
+        for name, flight in (('upstream', hw3.upstream_flight), ('chart', hw3.chart_flight))
+    }
+    server.shutdown()
+    fake.stop()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+离线的 Binance 替身：本地 HTTP 服务提供 /api/v3/klines 与 /api/v3/ticker/price。
+
+仓库不附带录制文件：基准以固定公式合成的 K 线为准，同一时间点在任何周期下价格一致，
+任何机器、任何时候的结果都可重复，适合比较不同提交。若要以真实价格测试，先用 record 子命令
+录制 fixtures/klines_<symbol>_<interval>.json，存在录制文件的周期会改用录制数据；
+结果的 kline_sources 会注明每个周期用的是哪一种，两者的结果不应相互比较。
+
+    python bench/fake_binance.py record --interval 1d     # 联网录制
+    python bench/fake_binance.py serve --port 9100        # 单独启动替身
+"""
+import argparse
+import bisect
+import json
+import math
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'HW3'))
+from binance_client import INTERVAL_MS, KLINE_LIMIT  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIRST_OPEN_TIME = 1502928000000  # BTCUSDT 在 Binance 的第一根 K 线（2017-08-17）
+DAY_MS = 86400000
+DEFAULT_LIMIT = 500
+REQUEST_WEIGHT = 2  # klines 与 ticker/price 的请求权重，按分钟累计后以 x-mbx-used-weight-1m 回报
+
+
+def synthetic_price(t):
+    """以时间（毫秒）决定的合成价格：长期上涨趋势 + 季节波动 + 日内波动"""
+    days = (t - FIRST_OPEN_TIME) / DAY_MS
+    return 4000 * math.exp(days / 1500) * (1 + 0.25 * math.sin(days / 90)) * (1 + 0.01 * math.sin(t / 3.7e6))
+
+
+def synthetic_kline(open_time, step):
+    open_price = synthetic_price(open_time)
+    close_price = synthetic_price(open_time + step)
+    high = max(open_price, close_price) * 1.002
+    low = min(open_price, close_price) * 0.998
+    return [open_time, f'{open_price:.2f}', f'{high:.2f}', f'{low:.2f}', f'{close_price:.2f}', '100.0',
+            open_time + step - 1, f'{100 * close_price:.2f}', 1000, '50.0', f'{50 * close_price:.2f}', '0']
+
+
+def fixture_path(symbol, interval):
+    return os.path.join(FIXTURES_DIR, f'klines_{symbol}_{interval}.json')
+
+
+class FakeBinance:
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, fixtures_dir=FIXTURES_DIR):
+        self.latency = latency  # 每个请求额外等待的秒数，模拟到 Binance 的往返时间
+        self.fixtures_dir = fixtures_dir
+        self._fixtures = {}
+        self.kline_sources = {}  # {'<symbol> <interval>': 'fixture' | 'synthetic'}
+        self._lock = threading.Lock()
+        self.requests = {'klines': 0, 'price': 0}
+        self._weight_minute = None
+        self._used_weight = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def _fixture(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._fixtures:
+            path = os.path.join(self.fixtures_dir, os.path.basename(fixture_path(symbol, interval)))
+            rows = None
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    rows = json.load(f)
+            self._fixtures[key] = (rows, [row[0] for row in rows] if rows else None)
+            self.kline_sources[f'{symbol} {interval}'] = 'fixture' if rows else 'synthetic'
+        return self._fixtures[key]
+
+    def klines(self, params):
+        symbol = params.get('symbol', 'BTCUSDT')
+        interval = params['interval']
+        step = INTERVAL_MS[interval]
+        limit = min(int(params.get('limit', DEFAULT_LIMIT)), KLINE_LIMIT)
+        now = int(time.time() * 1000)
+        end = min(int(params['endTime']), now) if 'endTime' in params else now
+        if 'startTime' in params:
+            start = int(params['startTime'])
+        else:
+            start = end - step * (limit - 1)  # 只给 endTime 时返回截至 endTime 的最近 limit 根
+
+        rows, open_times = self._fixture(symbol, interval)
+        if rows is not None:
+            i = bisect.bisect_left(open_times, start)
+            return [row for row in rows[i:i + limit] if row[0] <= end]
+
+        t = max(-(-start // step) * step, FIRST_OPEN_TIME)
+        result = []
+        while t <= end and len(result) < limit:
+            result.append(synthetic_kline(t, step))
+            t += step
+        return result
+
+    def use_weight(self, weight):
+        """与 Binance 相同，按自然分钟累计已用权重"""
+        minute = int(time.time() // 60)
+        with self._lock:
+            if minute != self._weight_minute:
+                self._weight_minute, self._used_weight = minute, 0
+            self._used_weight += weight
+            return self._used_weight
+
+    def price(self):
+        return {'symbol': 'BTCUSDT', 'price': f'{synthetic_price(time.time() * 1000):.2f}'}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if fake.latency:
+                    time.sleep(fake.latency)
+                try:
+                    if url.path == '/api/v3/klines':
+                        kind, body = 'klines', fake.klines(params)
+                    elif url.path == '/api/v3/ticker/price':
+                        kind, body = 'price', fake.price()
+                    else:
+                        self.send_error(404)
+                        return
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                with fake._lock:
+                    fake.requests[kind] += 1
+                used_weight = fake.use_weight(REQUEST_WEIGHT)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('x-mbx-used-weight-1m', str(used_weight))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # 压测时不输出访问日志
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-binance', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def record(symbol, interval, base_url='https://data-api.binance.vision'):
+    """从真实 API 下载全部历史 K 线并写入 fixtures"""
+    rows = []
+    start = FIRST_OPEN_TIME
+    while True:
+        response = requests.get(f'{base_url}/api/v3/klines', timeout=10, params={
+            'symbol': symbol, 'interval': interval, 'startTime': start, 'limit': KLINE_LIMIT
+        })
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page)
+        if len(page) < KLINE_LIMIT:
+            break
+        start = page[-1][0] + INTERVAL_MS[interval]
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    with open(fixture_path(symbol, interval), 'w', encoding='utf-8') as f:
+        json.dump(rows, f)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline Binance stand-in for benchmarks.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    record_parser = sub.add_parser('record')
+    record_parser.add_argument('--symbol', default='BTCUSDT')
+    record_parser.add_argument('--interval', default='1d', choices=sorted(INTERVAL_MS))
+    serve_parser = sub.add_parser('serve')
+    serve_parser.add_argument('--port', type=int, default=9100)
+    serve_parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        print(f'Recorded {record(args.symbol, args.interval)} klines to {fixture_path(args.symbol, args.interval)}')
+    else:
+        fake = FakeBinance(latency=args.latency, port=args.port)
+        print(f'Fake Binance listening on {fake.url}')
+        fake._server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
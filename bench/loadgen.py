@@ -0,0 +1,108 @@
+"""压测工具：在本地线程中启动 WSGI 应用，以固定并发数发送请求并统计延迟分位数与吞吐量"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass  # 压测时不输出访问日志
+
+
+def serve(app):
+    """以多线程 werkzeug 服务器在随机端口启动应用，返回 (server, base_url)"""
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(q / 100 * len(sorted_samples) + 0.5) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """延迟样本（秒）转为毫秒统计"""
+    samples = sorted(samples)
+    return {
+        'p50': round(percentile(samples, 50) * 1000, 3),
+        'p90': round(percentile(samples, 90) * 1000, 3),
+        'p99': round(percentile(samples, 99) * 1000, 3),
+        'mean': round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        'max': round(samples[-1] * 1000, 3) if samples else 0.0,
+    }
+
+
+def run_load(send, concurrency, total, warmup=5, session_setup=None):
+    """
+    以 concurrency 个线程共发送 total 个请求。send(session) 发出一个请求并返回 requests.Response，
+    状态码 >= 400 或抛出异常记为错误。每个线程使用自己的 Session（保持连接）。
+    """
+    def make_session():
+        session = requests.Session()
+        if session_setup:
+            session_setup(session)
+        return session
+
+    warm = make_session()
+    for _ in range(warmup):
+        send(warm)
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        nonlocal errors
+        session = make_session()
+        local, failed = [], 0
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            began = time.perf_counter()
+            try:
+                ok = send(session).status_code < 400
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - began)
+            failed += not ok
+        with lock:
+            latencies.extend(local)
+            errors += failed
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - began
+
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': summarize(latencies),
+    }
+
+
+def microbenchmark(fn, repeat=20, warmup=2):
+    """重复执行 fn，返回每次耗时（毫秒）的统计"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - began)
+    stats = summarize(samples)
+    stats['min'] = round(min(samples) * 1000, 3)
+    stats['repeat'] = repeat
+    return stats
@@ -0,0 +1,182 @@
+"""
+基准测试用的本地数据库替身，只在 bench 脚本中使用。
+
+- use_mongomock()：以 mongomock 取代 HW3 的 MongoClient（需另装 mongomock）
+- seed_kline_store()：把 Binance 替身的 K 线直接写入 KlineStore
+- FakeMySQLPool：实现 HW2 用到的连接池 / 连接 / 游标接口，join 与 dashboard 查询返回生成的数据
+"""
+import datetime
+import random
+import time
+from decimal import Decimal
+
+
+def use_mongomock():
+    import mongomock
+    import mongomock.aggregate
+    import mongo
+
+    mongo.MongoClient = mongomock.MongoClient
+
+    # mongomock 未实现 $substrCP（首页日志列表的摘要），对 ASCII 测试数据改用等价的 $substr
+    parser = mongomock.aggregate._Parser
+    handle_string_operator = parser._handle_string_operator
+
+    def _handle(self, operator, values):
+        return handle_string_operator(self, '$substr' if operator == '$substrCP' else operator, values)
+
+    parser._handle_string_operator = _handle
+
+
+def seed_kline_store(store, fake, symbol, interval, start_time, end_time_ms):
+    """
+    mongomock 的 upsert 每笔都扫描整个集合，冷启动写入数千根 K 线要数十秒。
+    因此以 insert_many 预先写入替身的数据并标记覆盖区间，基准测试只测稳定状态。
+    """
+    from binance_client import INTERVAL_MS, KLINE_LIMIT
+
+    step = INTERVAL_MS[interval]
+    rows = []
+    start = start_time
+    while True:
+        page = fake.klines({'symbol': symbol, 'interval': interval, 'startTime': start,
+                            'endTime': end_time_ms, 'limit': KLINE_LIMIT})
+        rows.extend(page)
+        if len(page) < KLINE_LIMIT:
+            break
+        start = page[-1][0] + step
+    if not rows:
+        return
+    store.candles.insert_many([
+        {'symbol': symbol, 'interval': interval, 'open_time': row[0], 'row': row} for row in rows
+    ])
+    last_closed = (int(time.time() * 1000) // step - 1) * step
+    store._mark_covered(symbol, interval, rows[0][0], min(rows[-1][0], last_closed))
+
+
+class FakeMySQLData:
+    """固定种子生成的 users / products / orders"""
+
+    def __init__(self, users=10, products=20, orders_per_user=2000, seed=42):
+        rng = random.Random(seed)
+        self.products = [{'id': i, 'product_name': f'Product {i}', 'price': Decimal(rng.randint(1, 500))}
+                         for i in range(1, products + 1)]
+        self.users = {i: {'id': i, 'username': f'user{i}', 'email': f'user{i}@example.com'} for i in range(1, users + 1)}
+        self.orders = {}  # user_id -> 按 id 排序的订单
+        order_id = 0
+        day = datetime.date(2020, 1, 1)
+        for user_id in self.users:
+            rows = []
+            for _ in range(orders_per_user):
+                order_id += 1
+                rows.append({'id': order_id, 'user_id': user_id, 'product_id': rng.randint(1, products),
+                             'order_date': day + datetime.timedelta(days=rng.randint(0, 1500)),
+                             'amount': Decimal(rng.randint(100, 100000)) / 100})
+            self.orders[user_id] = rows
+
+    def join_rows(self, user_id, after, limit):
+        user = self.users[user_id]
+        rows = []
+        for order in self.orders.get(user_id, []):
+            if order['id'] <= after:
+                continue
+            rows.append({'username': user['username'], 'email': user['email'], 'order_date': order['order_date'],
+                         'amount': order['amount'], 'product_name': self.products[order['product_id'] - 1]['product_name'],
+                         'order_id': order['id'], 'user_id': user_id})
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+
+    def user_totals(self, user_id):
+        orders = self.orders.get(user_id, [])
+        return {'order_count': len(orders), 'total_amount': sum((o['amount'] for o in orders), Decimal(0))}
+
+    def product_totals(self, user_id):
+        totals = {}
+        for order in self.orders.get(user_id, []):
+            count, amount = totals.get(order['product_id'], (0, Decimal(0)))
+            totals[order['product_id']] = (count + 1, amount + order['amount'])
+        return [{'product_id': p, 'order_count': c, 'total_amount': a}
+                for p, (c, a) in sorted(totals.items(), key=lambda item: -item[1][1])]
+
+
+class FakeCursor:
+    def __init__(self, data, latency, dictionary=False, **kwargs):
+        self._data = data
+        self._latency = latency
+        self._dictionary = dictionary
+        self._rows = []
+        self.description = None
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        if self._latency:
+            time.sleep(self._latency)  # 模拟到数据库的往返时间
+        params = tuple(params or ())
+        if 'FROM products' in query:
+            rows = self._data.products
+        elif 'JOIN users' in query:
+            limit = params[2] if 'LIMIT' in query else None
+            rows = self._data.join_rows(params[0], params[1], limit)
+        elif 'FROM user_order_stats' in query:
+            rows = [self._data.user_totals(params[0])]
+        elif 'FROM user_product_stats' in query:
+            rows = self._data.product_totals(params[0])
+        else:
+            raise NotImplementedError(f'FakeCursor does not support: {query.strip()[:60]}')
+        if rows:
+            self.description = [(name,) for name in rows[0]]
+        self._rows = rows if self._dictionary else [tuple(row.values()) for row in rows]
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, data, latency):
+        self._data = data
+        self._latency = latency
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self._data, self._latency, **kwargs)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def start_transaction(self):
+        pass
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeMySQLPool:
+    """可取代 mysql.connector.pooling.MySQLConnectionPool 的替身"""
+
+    def __init__(self, data, latency=0.0):
+        self._data = data
+        self._latency = latency
+
+    def __call__(self, **kwargs):
+        return self  # 作为 MySQLConnectionPool 的替代构造函数
+
+    def get_connection(self):
+        return FakeConnection(self._data, self._latency)
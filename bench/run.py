@@ -0,0 +1,112 @@
+"""
+运行全部基准测试并把结果写成 JSON，文件名含 commit，便于不同 commit 之间比较。
+HW2 与 HW3 都有名为 app 的模块，因此各自在子进程中运行。
+
+    python bench/run.py                                   # 写入 bench/results/<commit>.json
+    python bench/run.py --quick                           # 少量请求，快速检查
+    python bench/run.py compare bench/results/a.json bench/results/b.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_target(script, extra_args):
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        path = f.name
+    try:
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, script), '--output', path, *extra_args], check=True)
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(path)
+
+
+def run(args):
+    load_args = ['--concurrency', args.concurrency, '--requests', str(args.requests)]
+    hw3_args = load_args + ['--mongo-uri', args.mongo_uri]
+    hw2_args = load_args + ['--mysql', args.mysql]
+    if args.quick:
+        hw3_args += ['--dca-repeat', '3']
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'hw3': run_target('bench_hw3.py', hw3_args),
+        'hw2': run_target('bench_hw2.py', hw2_args),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results written to {output}')
+
+
+def rows(results):
+    """展开成 {(名称, 指标): 数值}"""
+    flat = {}
+    for target in ('hw3', 'hw2'):
+        for route, levels in results.get(target, {}).get('routes', {}).items():
+            for level in levels:
+                name = f"{target} {route} c={level['concurrency']}"
+                flat[(name, 'p50 ms')] = level['latency_ms']['p50']
+                flat[(name, 'p99 ms')] = level['latency_ms']['p99']
+                flat[(name, 'req/s')] = level['throughput_rps']
+    for years, stats in results.get('hw3', {}).get('run_dca', {}).items():
+        flat[(f'hw3 run_dca {years}', 'p50 ms')] = stats['p50']
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as f:
+        old = rows(json.load(f))
+    with open(new_path, encoding='utf-8') as f:
+        new = rows(json.load(f))
+    print(f"{'benchmark':<40} {'metric':<8} {'old':>10} {'new':>10} {'change':>8}")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = f'{(after - before) / before * 100:+.1f}%' if before else 'n/a'
+        print(f'{key[0]:<40} {key[1]:<8} {before:>10.2f} {after:>10.2f} {change:>8}')
+
+
+def main():
+    if sys.argv[1:2] == ['compare']:
+        if len(sys.argv) != 4:
+            sys.exit('usage: python bench/run.py compare OLD.json NEW.json')
+        compare(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description='Run the HW2/HW3 benchmark suite offline.')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--mongo-uri', default='mock')
+    parser.add_argument('--mysql', choices=('mock', 'local'), default='mock')
+    parser.add_argument('--quick', action='store_true', help='Few requests, for checking the suite itself')
+    parser.add_argument('--output')
+    args = parser.parse_args()
+    if args.quick:
+        args.concurrency, args.requests = '1,4', 20
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
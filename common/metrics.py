@@ -0,0 +1,113 @@
+"""
+HW2 / HW3 共用的 Prometheus 指标。
+
+init_app(app, name) 为每个路由记录延迟直方图并提供 /metrics；
+upstream_observer / db_observer 产生的回调交给 Binance 客户端、MongoDB 与 MySQL 连接层，
+每次调用结束时回报 (对象, 状态, 秒数)；queue_observer 记录请求等待上游限流额度的时间；cache_lookup / cache_miss 记录缓存命中情况。
+
+gunicorn 多进程部署时设置 PROMETHEUS_MULTIPROC_DIR（见 HW3/gunicorn.conf.py），
+/metrics 会汇总所有 worker 的数据；设置 METRICS_TOKEN 后需带 `Authorization: Bearer <token>`。
+"""
+import functools
+import hmac
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+DB_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latency of HTTP requests by route',
+    ['app', 'endpoint', 'method', 'status']
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Latency of calls to external APIs',
+    ['service', 'endpoint', 'status']
+)
+DB_LATENCY = Histogram(
+    'db_operation_duration_seconds', 'Latency of database operations',
+    ['db', 'operation', 'status'], buckets=DB_BUCKETS
+)
+UPSTREAM_QUEUE_WAIT = Histogram(
+    'upstream_queue_wait_seconds', 'Time spent waiting for upstream rate-limit budget',
+    ['service', 'priority'], buckets=DB_BUCKETS + (5.0, 10.0, 30.0)
+)
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups', ['cache'])
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that had to compute the value', ['cache'])
+
+
+def upstream_observer(service):
+    """返回 observer(endpoint, status, seconds)，status 为 HTTP 状态码或 'error'"""
+    def observe(endpoint, status, seconds):
+        UPSTREAM_LATENCY.labels(service, endpoint, str(status)).observe(seconds)
+    return observe
+
+
+def queue_observer(service):
+    """返回 observer(priority, seconds)：请求在限流队列中等待的时间"""
+    def observe(priority, seconds):
+        UPSTREAM_QUEUE_WAIT.labels(service, priority).observe(seconds)
+    return observe
+
+
+def db_observer(db):
+    """返回 observer(operation, status, seconds)，status 为 'ok' 或 'error'"""
+    def observe(operation, status, seconds):
+        DB_LATENCY.labels(db, operation, status).observe(seconds)
+    return observe
+
+
+def cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache).inc()
+    if not hit:
+        CACHE_MISSES.labels(cache).inc()
+
+
+def cache_miss(cache):
+    """在被缓存的函数内部调用：只有未命中时函数本体才会执行"""
+    CACHE_MISSES.labels(cache).inc()
+
+
+def count_lookups(cache):
+    """装饰在 @cache.memoize 之外，统计查询次数；命中数 = 查询数 - cache_miss 次数"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            CACHE_LOOKUPS.labels(cache).inc()
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def metrics_view():
+    token = os.getenv('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_app(app, name):
+    """记录 app 的每个请求耗时（按路由规则分组，避免路径参数造成标签爆炸），并注册 /metrics"""
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(name, endpoint, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,125 @@
+"""
+HW1 / HW2 / HW3 共用的密码哈希服务。
+
+密钥推导在有上限的线程池中执行（bcrypt 与 hashlib.pbkdf2_hmac 计算时会释放 GIL），
+登录高峰时同时进行的哈希数量不超过 workers，其余页面请求不必与之争抢 CPU。
+成本参数可配置；登录成功时若存储的哈希成本与当前设置不同，verify 会顺便返回新哈希。
+
+选择成本：python -m common.password_hashing --scheme bcrypt --target-ms 250
+"""
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+SCHEMES = ('bcrypt', 'pbkdf2')
+DEFAULT_COST = {'bcrypt': 12, 'pbkdf2': DEFAULT_PBKDF2_ITERATIONS}
+_PBKDF2_PATTERN = re.compile(r'^pbkdf2:sha256:(\d+)\$')
+
+
+def hash_scheme(stored_hash):
+    """由存储的哈希判断算法与成本，返回 (scheme, cost)，无法识别时为 (None, None)"""
+    if stored_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        return 'bcrypt', int(stored_hash[4:6])
+    match = _PBKDF2_PATTERN.match(stored_hash)
+    if match:
+        return 'pbkdf2', int(match.group(1))
+    return None, None
+
+
+def _hash(scheme, cost, password):
+    if scheme == 'bcrypt':
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=cost)).decode('utf-8')
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{cost}')
+
+
+def _check(stored_hash, password):
+    if hash_scheme(stored_hash)[0] == 'bcrypt':
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('utf-8'))
+    return check_password_hash(stored_hash, password)  # pbkdf2 及 werkzeug 支持的其他格式
+
+
+class PasswordHasher:
+    def __init__(self, scheme='bcrypt', cost=None, workers=None, timeout=30):
+        if scheme not in SCHEMES:
+            raise ValueError(f"Unknown password hash scheme: {scheme}")
+        self.scheme = scheme
+        self.cost = cost or DEFAULT_COST[scheme]  # bcrypt 为 log2 轮数，pbkdf2 为迭代次数
+        self.workers = workers or os.cpu_count() or 2
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls, scheme):
+        """读取 PASSWORD_HASH_WORKERS 以及 BCRYPT_ROUNDS / PBKDF2_ITERATIONS"""
+        cost_var = 'BCRYPT_ROUNDS' if scheme == 'bcrypt' else 'PBKDF2_ITERATIONS'
+        cost = int(os.getenv(cost_var, DEFAULT_COST[scheme]))
+        workers = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or None
+        return cls(scheme, cost=cost, workers=workers)
+
+    def _run(self, fn, *args):
+        # fork 出的子进程需要自己的线程池
+        if self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            self._pid = os.getpid()
+        return self._executor.submit(fn, *args).result(timeout=self.timeout)
+
+    def hash(self, password):
+        return self._run(_hash, self.scheme, self.cost, password)
+
+    def needs_rehash(self, stored_hash):
+        return hash_scheme(stored_hash) != (self.scheme, self.cost)
+
+    def verify(self, stored_hash, password):
+        """
+        返回 (ok, new_hash)。密码正确且存储的哈希与当前算法或成本不同时，
+        new_hash 为按当前设置重新计算的哈希，调用方应写回数据库；否则为 None。
+        """
+        if not stored_hash or not self._run(_check, stored_hash, password):
+            return False, None
+        if self.needs_rehash(stored_hash):
+            return True, self.hash(password)
+        return True, None
+
+
+def calibrate(scheme, target_ms):
+    """返回单次哈希耗时不超过 target_ms 的最高成本"""
+    if scheme == 'bcrypt':
+        best = 4
+        for rounds in range(4, 17):
+            start = time.perf_counter()
+            _hash('bcrypt', rounds, 'benchmark-password')
+            if (time.perf_counter() - start) * 1000 > target_ms:
+                break
+            best = rounds
+        return best
+
+    # pbkdf2 的耗时与迭代次数成正比，量一次再按比例换算
+    sample = 100_000
+    start = time.perf_counter()
+    _hash('pbkdf2', sample, 'benchmark-password')
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return max(int(sample * target_ms / elapsed_ms) // 10_000 * 10_000, 10_000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pick a password hashing cost for a target latency.')
+    parser.add_argument('--scheme', choices=SCHEMES, default='bcrypt')
+    parser.add_argument('--target-ms', type=float, default=250)
+    args = parser.parse_args()
+
+    cost = calibrate(args.scheme, args.target_ms)
+    start = time.perf_counter()
+    _hash(args.scheme, cost, 'benchmark-password')
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    cost_var = 'BCRYPT_ROUNDS' if args.scheme == 'bcrypt' else 'PBKDF2_ITERATIONS'
+    print(f"{cost_var}={cost}  # {elapsed_ms:.0f} ms per hash on this machine")
+
+
+if __name__ == '__main__':
+    main()